@@ -1,5 +1,6 @@
 import argparse
 import importlib
+import json
 import logging
 import sys
 import warnings
@@ -18,6 +19,7 @@ COMMAND_MODULES = (
     'ocdskit.cli.commands.detect_format',
     'ocdskit.cli.commands.echo',
     'ocdskit.cli.commands.indent',
+    'ocdskit.cli.commands.lookup',
     'ocdskit.cli.commands.mapping_sheet',
     'ocdskit.cli.commands.package_records',
     'ocdskit.cli.commands.package_releases',
@@ -38,6 +40,13 @@ def main():
     parser.add_argument('--encoding', help='the file encoding')
     parser.add_argument('--ascii', help='print escape sequences instead of UTF-8 characters', action='store_true')
     parser.add_argument('--pretty', help='pretty print output', action='store_true')
+    parser.add_argument('--jsonl', help='read JSON Lines input, with one JSON value per line', action='store_true')
+    parser.add_argument('--jsonl-output', help='print JSON Lines output, with one JSON value per line',
+                        action='store_true')
+    parser.add_argument('--line-buffered', help='write output after each item, instead of in blocks',
+                        action='store_true')
+    parser.add_argument('--verbose', help='print information about the command\'s progress to standard error, like '
+                        'the number of duplicate releases dropped', action='store_true')
 
     subparsers = parser.add_subparsers(dest='subcommand')
 
@@ -55,12 +64,24 @@ def main():
 
     if args.subcommand:
         command = subcommands[args.subcommand]
+        # Warnings and errors are printed by Python's last resort handler, if there's no handler.
+        if args.verbose:
+            handler = logging.StreamHandler()
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
         try:
+            if args.jsonl_output and args.pretty:
+                raise CommandError("--jsonl-output can't be used with --pretty")
+
             command.args = args
             try:
                 with warnings.catch_warnings():
                     warnings.showwarning = _showwarning
-                    command.handle()
+                    try:
+                        command.handle()
+                    finally:
+                        # Output that was printed before an error is written.
+                        command.flush()
             except ijson.common.IncompleteJSONError as e:
                 if e.args and isinstance(e.args[0], (bytes, UnicodeDecodeError)):
                     message = e.args[0]
@@ -70,9 +91,18 @@ def main():
                 raise CommandError('JSON error: {}'.format(e)) from e
             except UnicodeDecodeError as e:
                 _raise_encoding_error(e, args.encoding)
+            # orjson.JSONDecodeError is a subclass of json.JSONDecodeError.
+            except json.JSONDecodeError as e:
+                if 'not valid UTF-8' in e.msg:
+                    _raise_encoding_error(e, args.encoding)
+                raise CommandError('JSON error: {}'.format(e)) from e
         except CommandError as e:
             logger.critical(e)
             sys.exit(1)
+        finally:
+            if args.verbose:
+                logger.removeHandler(handler)
+                logger.setLevel(logging.NOTSET)
     else:
         parser.print_help()
 
@@ -4,7 +4,10 @@ from abc import ABC, abstractmethod
 
 import ijson
 
-from ocdskit.util import iterencode, json_dumps
+from ocdskit.util import iterencode, json_dumpb, read_json_lines
+
+# The number of bytes to buffer before writing to standard output.
+BUFFER_SIZE = 1 << 20
 
 
 class StandardInputReader:
@@ -18,6 +21,41 @@ class StandardInputReader:
         return data.decode(self.encoding).encode('utf-8')
 
 
+class StandardOutputWriter:
+    """
+    Writes bytes to standard output through a buffer, and writes the buffer when its size exceeds ``buffer_size``, or
+    when flushed.
+    """
+    def __init__(self, buffer_size=BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(data)
+        self.size += len(data)
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self.chunks:
+            return
+
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+
+        # Text written with print() is written first.
+        sys.stdout.flush()
+        # sys.stdout has no binary buffer if replaced by a text stream, like io.StringIO.
+        stream = getattr(sys.stdout, 'buffer', None)
+        if stream is None:
+            sys.stdout.write(data.decode())
+        else:
+            stream.write(data)
+        sys.stdout.flush()
+
+
 class BaseCommand(ABC):
     kwargs = {}
 
@@ -29,6 +67,7 @@ class BaseCommand(ABC):
         self.add_base_arguments()
         self.add_arguments()
         self.args = None
+        self.writer = StandardOutputWriter()
 
     def add_base_arguments(self):
         """
@@ -62,12 +101,17 @@ class BaseCommand(ABC):
         """
         Yields the items in the input.
         """
+        if self.args.jsonl:
+            # `kwargs` are ijson options, like `map_type`, which have no effect on JSON Lines input.
+            yield from read_json_lines(sys.stdin.buffer, self.prefix(), self.args.encoding)
+            return
+
         file = StandardInputReader(self.args.encoding)
         yield from ijson.items(file, self.prefix(), multiple_values=True, **kwargs)
 
     def print(self, data, streaming=False):
         """
-        Prints JSON data.
+        Prints JSON data. The output is buffered, unless ``--line-buffered`` is set.
 
         :param bool streaming: whether to stream output using ``json.JSONEncoder().iterencode()`` (it is only more
             memory efficient if ``data`` contains iterators)
@@ -81,16 +125,29 @@ class BaseCommand(ABC):
         try:
             if streaming:
                 for chunk in iterencode(data, **kwargs):
-                    print(chunk, end='')
-                print()
+                    self.writer.write(chunk.encode())
             else:
-                print(json_dumps(data, **kwargs))
-            sys.stdout.flush()
-        # https://docs.python.org/3/library/signal.html#note-on-sigpipe
+                self.writer.write(json_dumpb(data, **kwargs))
+            self.writer.write(b'\n')
+            if self.args.line_buffered:
+                self.writer.flush()
+        except BrokenPipeError:
+            self._exit_on_broken_pipe()
+
+    def flush(self):
+        """
+        Writes the buffered output.
+        """
+        try:
+            self.writer.flush()
         except BrokenPipeError:
-            devnull = os.open(os.devnull, os.O_WRONLY)
-            os.dup2(devnull, sys.stdout.fileno())
-            sys.exit(1)
+            self._exit_on_broken_pipe()
+
+    def _exit_on_broken_pipe(self):
+        # https://docs.python.org/3/library/signal.html#note-on-sigpipe
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
 
 
 class OCDSCommand(BaseCommand, ABC):
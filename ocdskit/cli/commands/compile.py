@@ -1,20 +1,42 @@
+import argparse
 import logging
+import os.path
 import sys
+from contextlib import ExitStack
 
 import ocdskit.packager
+import ocdskit.store
 from ocdskit.cli.commands.base import OCDSCommand
-from ocdskit.combine import merge
-from ocdskit.exceptions import CommandError, InconsistentVersionError, MissingOcidKeyError
+from ocdskit.combine import filter_changed_releases, merge
+from ocdskit.exceptions import (CommandError, InconsistentVersionError, MissingCheckpointError, MissingOcidKeyError,
+                                UnsortedInputError)
+from ocdskit.util import read_files
 
 logger = logging.getLogger('ocdskit')
 
+UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def size(value):
+    """
+    Parses a number of bytes, with an optional K, M, G or T suffix, like ``512M``.
+    """
+    value = value.upper().rstrip('B')
+    unit = value[-1:] if value[-1:] in UNITS else ''
+    try:
+        return int(float(value[:len(value) - len(unit)]) * UNITS[unit])
+    except ValueError as e:
+        raise argparse.ArgumentTypeError('invalid size: {!r}'.format(value)) from e
+
 
 class Command(OCDSCommand):
     name = 'compile'
-    help = 'reads release packages and individual releases from standard input, merges the releases by OCID, and ' \
-           'prints the compiled releases'
+    help = 'reads release packages and individual releases from files or standard input, merges the releases by ' \
+           'OCID, and prints the compiled releases'
 
     def add_arguments(self):
+        self.add_argument('files', nargs='*',
+                          help='the paths or glob patterns of files to read, instead of standard input')
         self.add_argument('--schema', help='the URL or path of the patched release schema to use')
         self.add_argument('--package', action='store_true', help='wrap the compiled releases in a record package')
         self.add_argument('--linked-releases', action='store_true',
@@ -22,6 +44,62 @@ class Command(OCDSCommand):
         self.add_argument('--versioned', action='store_true',
                           help='if --package is set, include versioned releases in the record package; otherwise, '
                                'print versioned releases instead of compiled releases')
+        self.add_argument('--workers', type=int, default=1,
+                          help='the number of worker processes with which to read files and merge releases')
+        self.add_argument('--backend',
+                          help='the backend with which to group releases by OCID: {}, or a PostgreSQL connection URI '
+                               '(default: sqlite if available, otherwise python)'.format(
+                                   ', '.join(sorted(ocdskit.packager.BACKENDS))))
+        self.add_argument('--compression', choices=sorted(ocdskit.packager.COMPRESSIONS),
+                          help='if the backend is sqlite, compress releases with this format')
+        self.add_argument('--compression-level', type=int,
+                          help='if --compression is set, the compression level: -1 to 9 for zlib, 0 to 9 for lzma '
+                               '(default: the format\'s default)')
+        self.add_argument('--partitions', type=int,
+                          help='if the backend is partitioned, the number of partitions (default: 16)')
+        self.add_argument('--state', metavar='PATH',
+                          help='store releases in this SQLite database across runs, and print only the OCIDs that '
+                               'have new releases')
+        self.add_argument('--all-ocids', action='store_true',
+                          help='if --state is set, print all OCIDs, not only those that have new releases')
+        self.add_argument('--memory-limit', type=size,
+                          help='group releases in memory until their memory usage exceeds this size (like '
+                               '512M or 2G), and then on disk')
+        self.add_argument('--grouped-input', action='store_true',
+                          help='the input\'s releases are sorted by OCID: merge each OCID\'s releases as soon as the '
+                               'next OCID is read, instead of storing releases')
+        self.add_argument('--incremental', action='store_true',
+                          help='merge each OCID\'s releases one at a time, in date order, instead of all at once, to '
+                               'limit memory usage for OCIDs with many releases')
+        self.add_argument('--upgrade', action='store_true',
+                          help='upgrade items from OCDS 1.0 to OCDS 1.1 before merging')
+        self.add_argument('--deduplicate', choices=sorted(ocdskit.packager.DEDUPLICATIONS),
+                          help='drop duplicate releases before merging, by content (identical releases) or by id '
+                               '(releases with the same ocid, id and date)')
+        self.add_argument('--ocid', action='append', dest='ocids', metavar='OCID',
+                          help='merge only the releases with this OCID (can be repeated)')
+        self.add_argument('--ocid-file', metavar='PATH',
+                          help='merge only the releases with the OCIDs in this file (one per line)')
+        self.add_argument('--as-of', metavar='DATE',
+                          help='merge only the releases whose date is less than or equal to this date, like '
+                               '2020-12-31T23:59:59Z')
+        self.add_argument('--changed-since', metavar='DATE',
+                          help='print only the OCIDs with at least one release whose date is greater than this date')
+        self.add_argument('--previous-hashes', metavar='FILE',
+                          help='print only the releases whose hash differs from their hash in this file, as written '
+                               'by --hashes')
+        self.add_argument('--hashes', metavar='FILE',
+                          help='write the OCID and hash of each release to this file (and of each OCID in '
+                               '--previous-hashes that isn\'t in the input)')
+        self.add_argument('--output-db', metavar='PATH',
+                          help='write the compiled releases (or versioned releases, if --versioned is set) to this '
+                               'SQLite database, instead of printing them')
+        self.add_argument('--checkpoint', metavar='PATH',
+                          help='store releases in this SQLite database, and periodically save the last OCID printed, '
+                               'so that the command can be resumed if it stops')
+        self.add_argument('--resume', action='store_true',
+                          help='if --checkpoint is set, don\'t read standard input, and print the OCIDs after the '
+                               'last OCID saved')
 
         self.add_package_arguments('record', 'if --package is set, ')
 
@@ -31,21 +109,201 @@ class Command(OCDSCommand):
         kwargs['return_package'] = self.args.package
         kwargs['use_linked_releases'] = self.args.linked_releases
         kwargs['return_versioned_release'] = self.args.versioned
+        kwargs['workers'] = self.args.workers
+        kwargs['memory_budget'] = self.args.memory_limit
+        kwargs['deduplicate'] = self.args.deduplicate
+        kwargs['ocids'] = self.get_ocids()
+        kwargs['as_of'] = self.args.as_of
+        kwargs['changed_since'] = self.args.changed_since
+        kwargs['incremental'] = self.args.incremental
+        if self.args.upgrade:
+            kwargs['upgrade_to'] = '1.1'
 
-        if not ocdskit.packager.USING_SQLITE:
+        if self.args.grouped_input:
+            options = ['--{}'.format(option.replace('_', '-')) for option in ('package', 'backend', 'compression',
+                                                                              'state', 'memory_limit', 'checkpoint')
+                       if getattr(self.args, option)]
+            if options:
+                raise CommandError('--grouped-input can\'t be used with {}'.format(' or '.join(options)))
+            kwargs['presorted'] = True
+        elif not any((self.args.backend, self.args.memory_limit, self.args.checkpoint, ocdskit.packager.USING_SQLITE)):
             logger.warning('sqlite3 is unavailable, so the command will run in memory. If input files are too large, '
                            'the command might exceed available memory.')
 
+        if self.args.compression:
+            levels = ocdskit.packager.COMPRESSION_LEVELS[self.args.compression]
+            if self.args.compression_level is not None and self.args.compression_level not in levels:
+                raise CommandError('--compression-level must be between {} and {} for {}'.format(
+                    levels[0], levels[-1], self.args.compression))
+        elif self.args.compression_level is not None:
+            raise CommandError('--compression-level requires --compression')
+
+        options = ['--{}'.format(option.replace('_', '-')) for option in ('previous_hashes', 'hashes')
+                   if getattr(self.args, option)]
+        if options and self.args.package:
+            raise CommandError('{} can\'t be used with --package'.format(' and '.join(options)))
+        # A resumed command would write only the hashes of the OCIDs after the checkpoint.
+        if options and self.args.checkpoint:
+            raise CommandError('{} can\'t be used with --checkpoint'.format(' and '.join(options)))
+        if self.args.incremental and self.args.package:
+            raise CommandError('--incremental can\'t be used with --package')
+        if self.args.output_db:
+            if self.args.package:
+                raise CommandError('--output-db can\'t be used with --package')
+            if not ocdskit.store.USING_SQLITE:
+                raise CommandError('sqlite3 is unavailable, so --output-db can\'t be used')
+
+        if self.args.checkpoint:
+            if self.args.package:
+                raise CommandError('--checkpoint can\'t be used with --package')
+            # The output database is committed only once the command succeeds, so it would lack the OCIDs before the
+            # checkpoint.
+            if self.args.output_db:
+                raise CommandError('--checkpoint can\'t be used with --output-db')
+            if self.args.resume:
+                # Otherwise, SQLite would create an empty database.
+                if not os.path.exists(self.args.checkpoint):
+                    raise CommandError('No such file or directory: {}'.format(self.args.checkpoint))
+            elif os.path.exists(self.args.checkpoint):
+                raise CommandError('{} already exists. Set --resume to resume from its checkpoint, or delete '
+                                   'it.'.format(self.args.checkpoint))
+            kwargs['checkpoint'] = True
+            kwargs['resume'] = self.args.resume
+        elif self.args.resume:
+            raise CommandError('--resume requires --checkpoint')
+
+        if not self.args.grouped_input:
+            kwargs['backend'] = self.get_backend()
+
+        if self.args.files:
+            data = read_files(self.args.files, prefix=self.prefix(), encoding=self.args.encoding,
+                              workers=self.args.workers, json_lines=self.args.jsonl)
+        else:
+            data = self.items()
+
+        hashes = None
         try:
-            for output in merge(self.items(), streaming=True, **kwargs):
-                self.print(output, streaming=self.args.package)
+            with ExitStack() as stack:
+                outputs = merge(data, streaming=True, **kwargs)
+
+                if options:
+                    previous_hashes = ()
+                    if self.args.previous_hashes:
+                        previous_hashes = stack.enter_context(open(self.args.previous_hashes))
+                    if self.args.hashes:
+                        # Write to a temporary file, so that the file is replaced only if the command succeeds.
+                        hashes = stack.enter_context(open(self.args.hashes + '.tmp', 'w'))
+                    outputs = filter_changed_releases(outputs, previous_hashes, hashes)
+
+                if self.args.output_db:
+                    store = stack.enter_context(ocdskit.store.ReleaseStore(self.args.output_db,
+                                                                           versioned=self.args.versioned))
+                    count = store.add(outputs)
+                    logger.info('%d releases were written to %s', count, self.args.output_db)
+                else:
+                    for output in outputs:
+                        self.print(output, streaming=self.args.package)
+                        # The checkpoint (or the state) is saved when the next output is requested, so the output must
+                        # be written before then. Otherwise, if the process is killed, buffered output is lost.
+                        if self.args.checkpoint or self.args.state:
+                            self.flush()
+
+            if hashes:
+                os.replace(hashes.name, self.args.hashes)
         except MissingOcidKeyError as e:
             raise CommandError('The `ocid` field of at least one release is missing.') from e
+        except FileNotFoundError as e:
+            raise CommandError('No such file or directory: {}'.format(e.filename)) from e
+        except IsADirectoryError as e:
+            raise CommandError('Is a directory: {}'.format(e.filename)) from e
+        except MissingCheckpointError as e:
+            raise CommandError('{} has no checkpoint, because the command stopped before reading all of standard '
+                               'input. Delete it and run the command again without --resume.'.format(
+                                   self.args.checkpoint)) from e
+        except UnsortedInputError as e:
+            raise CommandError('{}. Unset --grouped-input, or sort the input.'.format(e)) from e
         except InconsistentVersionError as e:
-            versions = [e.earlier_version, e.current_version]
-            if versions[1] < versions[0]:
-                versions.reverse()
-
-            message = '{}\nTry first upgrading items to the same version:\n  cat file [file ...] | ocdskit upgrade ' \
-                      '{}:{} | ocdskit compile {}'.format(str(e), *versions, ' '.join(sys.argv[2:]))
+            message = '{}\nTry upgrading items to the same version:\n  cat file [file ...] | ocdskit compile ' \
+                      '--upgrade {}'.format(str(e), ' '.join(sys.argv[2:]))
             raise CommandError(message) from e
+
+    def get_ocids(self):
+        """
+        Returns the OCIDs set by ``--ocid`` and ``--ocid-file``, or ``None`` if neither is set.
+        """
+        if not self.args.ocids and not self.args.ocid_file:
+            return None
+
+        # The other releases would be dropped before they are stored in the durable database.
+        options = ['--{}'.format(option) for option in ('state', 'checkpoint') if getattr(self.args, option)]
+        if options:
+            ocid_options = [option for option, value in (('--ocid', self.args.ocids),
+                                                         ('--ocid-file', self.args.ocid_file)) if value]
+            raise CommandError('{} can\'t be used with {}'.format(' and '.join(ocid_options), ' or '.join(options)))
+
+        ocids = set(self.args.ocids or [])
+        if self.args.ocid_file:
+            try:
+                with open(self.args.ocid_file) as f:
+                    ocids.update(line.strip() for line in f if line.strip())
+            except FileNotFoundError as e:
+                raise CommandError('No such file or directory: {}'.format(e.filename)) from e
+            except IsADirectoryError as e:
+                raise CommandError('Is a directory: {}'.format(e.filename)) from e
+        return ocids
+
+    def get_backend(self):
+        """
+        Returns the backend with which to group releases by OCID, or ``None`` if ``--memory-limit`` is set.
+        """
+        if self.args.memory_limit:
+            options = ['--{}'.format(option) for option in ('backend', 'compression', 'partitions', 'state',
+                                                            'checkpoint') if getattr(self.args, option)]
+            if options:
+                raise CommandError('--memory-limit can\'t be used with {}'.format(' or '.join(options)))
+            return None
+
+        name = self.args.backend
+        if not name:
+            if ocdskit.packager.USING_SQLITE or self.args.checkpoint:
+                name = 'sqlite'
+            else:
+                name = 'python'
+
+        kwargs = {}
+        if self.args.compression:
+            kwargs['compression'] = self.args.compression
+            kwargs['compression_level'] = self.args.compression_level
+        if self.args.state:
+            if self.args.checkpoint:
+                raise CommandError('--checkpoint can\'t be used with --state')
+            kwargs['path'] = self.args.state
+            kwargs['only_touched'] = not self.args.all_ocids
+        if self.args.checkpoint:
+            kwargs['path'] = self.args.checkpoint
+            kwargs['only_touched'] = False
+
+        if kwargs and name != 'sqlite':
+            options = ['--{}'.format(option) for option in ('compression', 'state', 'checkpoint')
+                       if getattr(self.args, option)]
+            raise CommandError('{} requires the sqlite backend'.format(' and '.join(options)))
+
+        if self.args.partitions is not None:
+            if name != 'partitioned':
+                raise CommandError('--partitions requires the partitioned backend')
+            if self.args.partitions < 1:
+                raise CommandError('--partitions must be a positive integer')
+            kwargs['partitions'] = self.args.partitions
+
+        if name == 'sqlite' and not ocdskit.packager.USING_SQLITE:
+            raise CommandError('sqlite3 is unavailable, so the sqlite backend can\'t be used')
+        if name.startswith(('postgresql://', 'postgres://')) and not ocdskit.packager.USING_PSYCOPG2:
+            raise CommandError('psycopg2 is unavailable. Install it with: pip install ocdskit[postgresql]')
+        if name == 'duckdb' and not ocdskit.packager.USING_DUCKDB:
+            raise CommandError('duckdb is unavailable. Install it with: pip install ocdskit[duckdb]')
+
+        try:
+            return ocdskit.packager.get_backend(name, **kwargs)
+        except KeyError as e:
+            raise CommandError('--backend must be one of {}, or a PostgreSQL connection URI'.format(
+                ', '.join(sorted(ocdskit.packager.BACKENDS)))) from e
@@ -0,0 +1,66 @@
+import logging
+import os.path
+
+from ocdskit.cli.commands.base import BaseCommand
+from ocdskit.exceptions import CommandError, InvalidDatabaseError, MissingTableError
+from ocdskit.store import USING_SQLITE, ReleaseStore
+
+logger = logging.getLogger('ocdskit')
+
+
+class Command(BaseCommand):
+    name = 'lookup'
+    help = 'reads compiled releases from a SQLite database written by the compile command, and prints the compiled ' \
+           'releases with the given OCIDs or that match the given conditions'
+
+    def add_arguments(self):
+        self.add_argument('database', help='the path to the database, as written by compile --output-db')
+        self.add_argument('ocids', nargs='*', metavar='OCID', help='the OCIDs of the releases to print')
+        self.add_argument('--versioned', action='store_true',
+                          help='print versioned releases instead of compiled releases')
+        self.add_argument('--date-from', metavar='DATE',
+                          help='print only the releases whose date is greater than or equal to this date')
+        self.add_argument('--date-to', metavar='DATE',
+                          help='print only the releases whose date is less than or equal to this date')
+        self.add_argument('--buyer-id', help='print only the releases whose buyer\'s id is this value')
+        self.add_argument('--tag', help='print only the releases with this tag')
+
+    def handle(self):
+        if not USING_SQLITE:
+            raise CommandError('sqlite3 is unavailable, so the lookup command can\'t be used')
+        if not os.path.exists(self.args.database):
+            raise CommandError('No such file or directory: {}'.format(self.args.database))
+
+        kwargs = {
+            'date_from': self.args.date_from,
+            'date_to': self.args.date_to,
+            'buyer_id': self.args.buyer_id,
+            'tag': self.args.tag,
+        }
+
+        options = ['--{}'.format(option.replace('_', '-')) for option, value in kwargs.items() if value is not None]
+        if options and self.args.ocids:
+            raise CommandError('OCIDs can\'t be used with {}'.format(' or '.join(options)))
+
+        try:
+            store = ReleaseStore(self.args.database, versioned=self.args.versioned, readonly=True)
+        except MissingTableError as e:
+            if self.args.versioned:
+                kind = 'versioned'
+            else:
+                kind = 'compiled'
+            raise CommandError('{} has no {} releases'.format(self.args.database, kind)) from e
+        except InvalidDatabaseError as e:
+            raise CommandError(str(e)) from e
+
+        with store:
+            if self.args.ocids:
+                for ocid in self.args.ocids:
+                    release = store.get(ocid)
+                    if release is None:
+                        logger.warning('%s: not found', ocid)
+                    else:
+                        self.print(release)
+            else:
+                for release in store.find(**kwargs):
+                    self.print(release)
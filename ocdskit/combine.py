@@ -1,16 +1,20 @@
 import warnings
+from functools import lru_cache
 
 from ocdsextensionregistry import ProfileBuilder
 from ocdsmerge import Merger
 from ocdsmerge.util import get_release_schema_url, get_tags
 
 from ocdskit.exceptions import MissingRecordsWarning, MissingReleasesWarning
-from ocdskit.packager import Packager
+from ocdskit.packager import Packager, _content_key
 from ocdskit.util import (_empty_record_package, _empty_release_package, _remove_empty_optional_metadata,
                           _resolve_metadata, _update_package_metadata)
 
 DEFAULT_VERSION = '1.1'  # fields might be deprecated
 
+# The number of OCIDs to merge between checkpoints.
+CHECKPOINT_INTERVAL = 1000
+
 
 def _package(key, items, uri, publisher, published_date, version, extensions=None):
     if publisher is None:
@@ -127,7 +131,9 @@ def combine_release_packages(packages, uri='', publisher=None, published_date=''
 
 
 def merge(data, uri='', publisher=None, published_date='', version=DEFAULT_VERSION, schema=None,
-          return_versioned_release=False, return_package=False, use_linked_releases=False, streaming=False):
+          return_versioned_release=False, return_package=False, use_linked_releases=False, streaming=False,
+          workers=None, backend=None, memory_budget=None, checkpoint=False, resume=False, upgrade_to=None,
+          deduplicate=None, ocids=None, presorted=False, as_of=None, changed_since=None, incremental=False):
     """
     Merges release packages and individual releases.
 
@@ -138,7 +144,8 @@ def merge(data, uri='', publisher=None, published_date='', version=DEFAULT_VERSI
     If ``return_package`` is set and ``publisher`` isn't set, the output record package will have the same publisher as
     the last input release package.
 
-    :param data: an iterable of release packages and individual releases
+    :param data: an iterable of release packages and individual releases (to read them from files in parallel, use
+        :func:`~ocdskit.util.read_files`)
     :param str uri: if ``return_package`` is ``True``, the record package's ``uri``
     :param dict publisher: if ``return_package`` is ``True``, the record package's ``publisher``
     :param str published_date: if ``return_package`` is ``True``, the record package's ``publishedDate``
@@ -151,22 +158,55 @@ def merge(data, uri='', publisher=None, published_date='', version=DEFAULT_VERSI
         package; otherwise, yield versioned releases instead of compiled releases
     :param bool streaming: if ``return_package`` is ``True``, set the package's records to a generator (this only works
         if the calling code exhausts the generator before ``merge`` returns)
-    :raises InconsistentVersionError: if the versions are inconsistent across packages to merge
+    :param int workers: the number of worker processes with which to merge releases (releases are still yielded in
+        order of OCID)
+    :param backend: the backend with which to group releases by OCID (see :class:`~ocdskit.packager.Packager`)
+    :param int memory_budget: if ``backend`` isn't set, group releases in memory until their memory usage exceeds
+        this number of bytes, and then on disk (see :class:`~ocdskit.packager.Packager`)
+    :param bool checkpoint: if ``return_package`` is ``False``, save a checkpoint to the backend once all releases are
+        added, and periodically while releases are yielded (the backend must be a
+        :class:`~ocdskit.packager.SQLiteBackend` with a ``path`` and with ``only_touched`` set to ``False``)
+    :param bool resume: ignore ``data``, and yield only the releases for the OCIDs after the backend's checkpoint
+    :param str upgrade_to: upgrade items from older versions of OCDS to this version, like ``1.1``, before merging
+    :param str deduplicate: drop duplicate releases before merging, by ``content`` or by ``id`` (see
+        :class:`~ocdskit.packager.Packager`)
+    :param ocids: if set, merge only the releases whose ``ocid`` is one of these OCIDs (other releases are dropped as
+        they are read)
+    :param bool presorted: whether the releases are sorted by OCID, in which case each OCID's releases are merged as
+        soon as a release with the next OCID is read, instead of being stored (the merger is selected using the version
+        and extensions of the packages read before the first OCID's releases are merged; if ``return_package`` and
+        ``streaming`` are ``True``, the package metadata is of those packages, too)
+    :param str as_of: merge only the releases whose ``date`` is less than or equal to this date, like
+        ``2020-12-31T23:59:59Z`` (see :class:`~ocdskit.packager.Packager`)
+    :param str changed_since: merge only the OCIDs with at least one release whose ``date`` is greater than this date
+        (see :class:`~ocdskit.packager.Packager`)
+    :param bool incremental: if ``return_package`` is ``False``, merge each OCID's releases one at a time, in date
+        order, to limit memory usage for OCIDs with many releases (``workers`` is ignored; see
+        :meth:`~ocdskit.packager.Packager.output_releases`)
+    :raises InconsistentVersionError: if the versions are inconsistent across packages to merge (after upgrading, if
+        ``upgrade_to`` is set)
     :raises MissingOcidKeyError: if the release is missing an ``ocid`` field
+    :raises MissingCheckpointError: if ``resume`` is ``True`` and the backend has no checkpoint
+    :raises UnsortedInputError: if ``presorted`` is ``True`` and the releases aren't sorted by OCID
     """
-    with Packager() as packager:
-        packager.add(data)
-
-        if not schema and packager.version:
-            prefix = packager.version.replace('.', '__') + '__'
-            tag = next(tag for tag in reversed(get_tags()) if tag.startswith(prefix))
-            schema = get_release_schema_url(tag)
-
-            if packager.package['extensions']:
-                builder = ProfileBuilder(tag, list(packager.package['extensions']))
-                schema = builder.patched_release_schema()
+    # The python backend doesn't create a temporary file, and isn't used if the input is presorted.
+    if presorted and backend is None:
+        backend = 'python'
+
+    with Packager(backend=backend, memory_budget=memory_budget, upgrade_to=upgrade_to,
+                  deduplicate=deduplicate, ocids=ocids, as_of=as_of, changed_since=changed_since) as packager:
+        if resume:
+            after = packager.load_checkpoint()
+        elif presorted:
+            packager.add_presorted(data)
+            after = None
+        else:
+            packager.add(data)
+            after = None
+            if checkpoint:
+                packager.save_checkpoint()
 
-        merger = Merger(schema)
+        merger = get_merger(schema, packager.version, packager.package['extensions'])
 
         if return_package:
             packager.package['uri'] = uri
@@ -176,9 +216,103 @@ def merge(data, uri='', publisher=None, published_date='', version=DEFAULT_VERSI
                 packager.package['publisher'] = publisher
 
             yield from packager.output_package(merger, return_versioned_release=return_versioned_release,
-                                               use_linked_releases=use_linked_releases, streaming=streaming)
+                                               use_linked_releases=use_linked_releases, streaming=streaming,
+                                               workers=workers)
+        else:
+            releases = packager.output_releases(merger, return_versioned_release=return_versioned_release,
+                                                workers=workers, after=after, incremental=incremental)
+            if checkpoint:
+                releases = _checkpoint(packager, releases, after)
+            yield from releases
+
+
+def _checkpoint(packager, releases, ocid):
+    # The OCID of a release is saved only once the calling code requests the next release, or stops.
+    try:
+        for i, release in enumerate(releases, 1):
+            yield release
+            ocid = release['ocid']
+            if i % CHECKPOINT_INTERVAL == 0:
+                packager.save_checkpoint(ocid)
+    finally:
+        packager.save_checkpoint(ocid)
+
+
+def filter_changed_releases(releases, previous_hashes=(), hashes=None):
+    """
+    Yields the compiled releases or versioned releases whose hash differs from the previous hash for the same OCID, or
+    whose OCID has no previous hash.
+
+    The hash of a release is the hash of its JSON with sorted keys. The previous hashes and the releases must be
+    ordered by OCID (like the output of :meth:`~ocdskit.combine.merge`), so that they are compared in one pass.
+
+    :param releases: compiled releases or versioned releases, ordered by OCID
+    :param previous_hashes: lines of an OCID and a hash, separated by a tab, ordered by OCID (like a file object
+        written by an earlier call)
+    :param hashes: a file-like object to which to write the lines of an OCID and a hash, separated by a tab, for the
+        releases and for the OCIDs of previous hashes that aren't in the releases, ordered by OCID
+    """
+    previous = (line.rstrip('\n').split('\t', 1) for line in previous_hashes if line.strip())
+    entry = next(previous, None)
+
+    for release in releases:
+        ocid = release['ocid']
+        digest = _content_key(release).hex()
+
+        # Keep the previous hashes of OCIDs that aren't in the releases.
+        while entry and entry[0] < ocid:
+            if hashes:
+                hashes.write('{}\t{}\n'.format(*entry))
+            entry = next(previous, None)
+
+        if entry and entry[0] == ocid:
+            changed = entry[1] != digest
+            entry = next(previous, None)
         else:
-            yield from packager.output_releases(merger, return_versioned_release=return_versioned_release)
+            changed = True
+
+        if hashes:
+            hashes.write('{}\t{}\n'.format(ocid, digest))
+
+        if changed:
+            yield release
+
+    while entry:
+        if hashes:
+            hashes.write('{}\t{}\n'.format(*entry))
+        entry = next(previous, None)
+
+
+def get_merger(schema=None, version=None, extensions=()):
+    """
+    Returns a merger. If ``schema`` isn't a dict, the merger is cached, so that the release schema is retrieved (and
+    patched) and the merge rules are calculated only once per process.
+
+    :param schema: the URL, path or dict of the patched release schema to use
+    :param str version: if ``schema`` isn't set, the OCDS minor version of the release schema to use, like ``1.1``
+    :param extensions: if ``schema`` isn't set, the URLs of the extensions with which to patch the release schema
+    """
+    if isinstance(schema, dict):
+        return Merger(schema)
+    if schema:
+        version = None
+        extensions = ()
+    return _get_merger(schema, version, tuple(extensions))
+
+
+@lru_cache()
+def _get_merger(schema, version, extensions):
+    if not schema and version:
+        prefix = version.replace('.', '__') + '__'
+        tag = next(tag for tag in reversed(get_tags()) if tag.startswith(prefix))
+        schema = get_release_schema_url(tag)
+
+        # The order of extensions is retained, as it can affect the patched release schema.
+        if extensions:
+            builder = ProfileBuilder(tag, list(extensions))
+            schema = builder.patched_release_schema()
+
+    return Merger(schema)
 
 
 def compile_release_packages(*args, **kwargs):
@@ -19,6 +19,14 @@ class MissingColumnError(OCDSKitError):
     """Raised if the column by which to order is missing"""
 
 
+class InvalidDatabaseError(OCDSKitError):
+    """Raised if a release store opened in read-only mode isn't a SQLite database"""
+
+
+class MissingTableError(OCDSKitError):
+    """Raised if a release store opened in read-only mode has no table for the type of releases"""
+
+
 class UnknownFormatError(OCDSKitError):
     """Raised if the format of a file can't be determined"""
 
@@ -27,6 +35,14 @@ class MissingOcidKeyError(OCDSKitError, KeyError):
     """Raised if a release to be merged is missing an ``ocid`` field"""
 
 
+class MissingCheckpointError(OCDSKitError):
+    """Raised if there is no checkpoint from which to resume merging"""
+
+
+class UnsortedInputError(OCDSKitError):
+    """Raised if releases to be merged as presorted input aren't sorted by OCID"""
+
+
 class OCDSKitWarning(UserWarning):
     """Base class for warnings from within this package"""
 
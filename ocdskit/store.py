@@ -0,0 +1,196 @@
+import itertools
+from urllib.parse import quote
+
+from ocdskit.exceptions import InvalidDatabaseError, MissingTableError
+from ocdskit.util import json_dumpb, jsonlib
+
+try:
+    import sqlite3
+
+    USING_SQLITE = True
+except ImportError:
+    USING_SQLITE = False
+
+# The number of releases to insert at a time.
+BATCH_SIZE = 1000
+
+
+def _latest_value(value):
+    # Returns the latest value of a versioned field, or the value of a compiled field.
+    if isinstance(value, list) and value and isinstance(value[-1], dict) and 'releaseTag' in value[-1]:
+        return value[-1].get('value')
+    return value
+
+
+def _scalar(value):
+    # SQLite can index a string or a number, but not an object or an array.
+    if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+        return value
+    return None
+
+
+def _add_versions(value, tags, dates):
+    # Adds the `releaseTag` and `releaseDate` values of all versioned values to the tags and dates.
+    if isinstance(value, dict):
+        for item in value.values():
+            _add_versions(item, tags, dates)
+    elif isinstance(value, list):
+        for item in value:
+            if isinstance(item, dict) and 'releaseTag' in item:
+                tags.update(dict.fromkeys(item['releaseTag'] or ()))
+                if isinstance(item.get('releaseDate'), str):
+                    dates.add(item['releaseDate'])
+            else:
+                _add_versions(item, tags, dates)
+
+
+class ReleaseStore:
+    """
+    The ReleaseStore context manager stores compiled releases or versioned releases in a SQLite database, keyed by
+    OCID, with indexes on their ``date``, ``buyer.id`` and tags, so that releases can be looked up without reading all
+    of them.
+
+    Compiled releases and versioned releases are stored in different tables. A versioned release has no ``date``, so
+    the latest ``releaseDate`` of its versioned values is indexed instead. For versioned releases, the latest value of
+    ``buyer.id`` is indexed, and the tags are the ``releaseTag`` values of all versioned values.
+    """
+    def __init__(self, path, versioned=False, readonly=False):
+        """
+        :param str path: the path to the database (if it doesn't exist and ``readonly`` is ``False``, it is created)
+        :param bool versioned: whether to store versioned releases instead of compiled releases
+        :param bool readonly: whether to open the database in read-only mode
+        :raises InvalidDatabaseError: if ``readonly`` is ``True`` and the file isn't a SQLite database
+        :raises MissingTableError: if ``readonly`` is ``True`` and the database has no table for the type of releases
+        """
+        self.versioned = versioned
+        if versioned:
+            self.table = 'versioned_releases'
+        else:
+            self.table = 'compiled_releases'
+
+        if readonly:
+            # https://sqlite.org/uri.html
+            self.connection = sqlite3.connect('file:{}?mode=ro'.format(quote(path)), uri=True)
+            sql = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?"
+            # The file is read only once a statement is executed.
+            try:
+                row = self.connection.execute(sql, (self.table,)).fetchone()
+            except sqlite3.DatabaseError as e:
+                self.connection.close()
+                raise InvalidDatabaseError('{} is not a SQLite database'.format(path)) from e
+            if not row:
+                self.connection.close()
+                raise MissingTableError('{} has no {} table'.format(path, self.table))
+            return
+
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS {} (ocid text PRIMARY KEY, date text, buyer_id text, "
+                                "release blob)".format(self.table))
+        # The primary key is an index on the tag.
+        self.connection.execute("CREATE TABLE IF NOT EXISTS {}_tags (tag text, ocid text, PRIMARY KEY (tag, ocid)) "
+                                "WITHOUT ROWID".format(self.table))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type_, value, traceback):
+        self.close()
+
+    def add(self, releases):
+        """
+        Adds releases to the database, replacing any releases with the same OCIDs, and returns the number of releases
+        added. The releases are committed once all are added.
+
+        :param releases: an iterable of compiled releases or versioned releases
+        """
+        count = 0
+
+        releases = iter(releases)
+        while True:
+            batch = list(itertools.islice(releases, BATCH_SIZE))
+            if not batch:
+                break
+
+            rows = []
+            tags = []
+            for release in batch:
+                ocid = release['ocid']
+                date, release_tags = self._get_date_and_tags(release)
+                rows.append((ocid, _scalar(date), _scalar(_latest_value((release.get('buyer') or {}).get('id'))),
+                             json_dumpb(release)))
+                tags.extend((tag, ocid) for tag in release_tags)
+
+            self.connection.executemany("DELETE FROM {}_tags WHERE ocid = ?".format(self.table),
+                                        ((row[0],) for row in rows))
+            self.connection.executemany("INSERT OR REPLACE INTO {} VALUES (?, ?, ?, ?)".format(self.table), rows)
+            self.connection.executemany("INSERT OR IGNORE INTO {}_tags VALUES (?, ?)".format(self.table), tags)
+
+            count += len(batch)
+
+        # The indexes are created after the first releases are inserted, which is faster than updating them.
+        self.connection.execute("CREATE INDEX IF NOT EXISTS {0}_date_idx ON {0}(date)".format(self.table))
+        self.connection.execute("CREATE INDEX IF NOT EXISTS {0}_buyer_id_idx ON {0}(buyer_id)".format(self.table))
+        self.connection.commit()
+
+        return count
+
+    def get(self, ocid):
+        """
+        Returns the release with the OCID, or ``None`` if there is none.
+
+        :param str ocid: an OCID
+        """
+        row = self.connection.execute("SELECT release FROM {} WHERE ocid = ?".format(self.table), (ocid,)).fetchone()
+        if row:
+            return jsonlib.loads(row[0])
+        return None
+
+    def find(self, date_from=None, date_to=None, buyer_id=None, tag=None):
+        """
+        Yields the releases that match all the conditions, ordered by OCID.
+
+        Dates are compared as strings, so ``date_from`` and ``date_to`` should use the same format as the releases'
+        dates, like ``2020-12-31T23:59:59Z``.
+
+        :param str date_from: if set, yield only the releases whose ``date`` is greater than or equal to this date
+        :param str date_to: if set, yield only the releases whose ``date`` is less than or equal to this date
+        :param str buyer_id: if set, yield only the releases whose ``buyer.id`` is this value
+        :param str tag: if set, yield only the releases with this tag
+        """
+        conditions = []
+        parameters = []
+        if date_from is not None:
+            conditions.append("date >= ?")
+            parameters.append(date_from)
+        if date_to is not None:
+            conditions.append("date <= ?")
+            parameters.append(date_to)
+        if buyer_id is not None:
+            conditions.append("buyer_id = ?")
+            parameters.append(buyer_id)
+        if tag is not None:
+            conditions.append("ocid IN (SELECT ocid FROM {}_tags WHERE tag = ?)".format(self.table))
+            parameters.append(tag)
+
+        sql = "SELECT release FROM {}".format(self.table)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        for row in self.connection.execute(sql + " ORDER BY ocid", parameters):
+            yield jsonlib.loads(row[0])
+
+    def close(self):
+        """
+        Closes the database. Releases that weren't committed are rolled back.
+        """
+        self.connection.close()
+
+    def _get_date_and_tags(self, release):
+        if self.versioned:
+            tags = {}
+            dates = set()
+            _add_versions(release, tags, dates)
+            date = max(dates, default=None)
+        else:
+            tags = release.get('tag') or ()
+            date = release.get('date')
+        return date, [tag for tag in tags if isinstance(tag, str)]
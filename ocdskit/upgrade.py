@@ -19,9 +19,16 @@ organization_identification_1_0 = (
 
 
 def _move_to_top(data, fields):
-    for field in reversed(fields):
-        if field in data:
-            data.move_to_end(field, last=False)
+    if isinstance(data, OrderedDict):
+        for field in reversed(fields):
+            if field in data:
+                data.move_to_end(field, last=False)
+    else:
+        # A dict has no `move_to_end` method, so re-insert all its items.
+        items = [(field, data.pop(field)) for field in fields if field in data]
+        items.extend(data.items())
+        data.clear()
+        data.update(items)
 
 
 def _in(obj, field):
@@ -48,9 +55,7 @@ def upgrade_10_11(data):
 
     Retains the deprecated Amendment.changes, Budget.source and Milestone.documents fields.
 
-    ``data`` must be an ``OrderedDict``. If you have only the parsed JSON, re-parse it with:
-
-    ``upgrade_10_11(json.loads(json.dumps(data), object_pairs_hook=OrderedDict))``
+    ``data`` can be a ``dict`` or an ``OrderedDict``. The upgrade is in-place.
     """
     version = get_ocds_minor_version(data)
     if version != '1.0':
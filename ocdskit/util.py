@@ -1,5 +1,9 @@
+import glob
+import io
 import itertools
 import json
+import multiprocessing
+import os
 from decimal import Decimal
 
 import ijson
@@ -76,21 +80,39 @@ def json_dumps(data, ensure_ascii=False, indent=None, sort_keys=False, **kwargs)
     """
     Dumps JSON to a string, and returns it.
     """
-    # orjson doesn't support `ensure_ascii` if `True`, `indent` if not `2` or other arguments except for `sort_keys`.
-    if not USING_ORJSON or ensure_ascii or indent and indent != 2 or kwargs:
+    if not _can_use_orjson(ensure_ascii, indent, kwargs):
         if not indent:
             kwargs['separators'] = (',', ':')
         return json.dumps(data, cls=JSONEncoder, ensure_ascii=ensure_ascii, indent=indent, sort_keys=sort_keys,
                           **kwargs)
 
+    # orjson dumps to bytes.
+    return _orjson_dumps(data, indent, sort_keys).decode()
+
+
+def json_dumpb(data, ensure_ascii=False, indent=None, sort_keys=False, **kwargs):
+    """
+    Dumps JSON to UTF-8 bytes, and returns it.
+    """
+    if not _can_use_orjson(ensure_ascii, indent, kwargs):
+        return json_dumps(data, ensure_ascii=ensure_ascii, indent=indent, sort_keys=sort_keys, **kwargs).encode()
+
+    return _orjson_dumps(data, indent, sort_keys)
+
+
+def _can_use_orjson(ensure_ascii, indent, kwargs):
+    # orjson doesn't support `ensure_ascii` if `True`, `indent` if not `2` or other arguments except for `sort_keys`.
+    return USING_ORJSON and not ensure_ascii and not (indent and indent != 2) and not kwargs
+
+
+def _orjson_dumps(data, indent, sort_keys):
     option = 0
     if indent:
         option |= orjson.OPT_INDENT_2
     if sort_keys:
         option |= orjson.OPT_SORT_KEYS
 
-    # orjson dumps to bytes.
-    return orjson.dumps(data, default=JSONEncoder().default, option=option).decode()
+    return orjson.dumps(data, default=JSONEncoder().default, option=option)
 
 
 def get_ocds_minor_version(data):
@@ -245,6 +267,95 @@ def detect_format(path, root_path=''):
         return _detect_format_result(False, is_array, has_records, has_releases, has_ocid, has_tag, is_compiled)
 
 
+def read_json_lines(f, prefix='', encoding=None):
+    """
+    Yields the items in a JSON Lines file, like ``ijson.items(f, prefix, multiple_values=True)``. Each line is parsed
+    with orjson, if available, which is several times faster than ijson. Blank lines are skipped.
+
+    :param f: a file opened in binary mode
+    :param str prefix: the path to the items within each line
+    :param str encoding: the file's encoding (default: UTF-8)
+    """
+    keys = prefix.split('.') if prefix else []
+
+    for line in f:
+        if encoding and encoding != 'utf-8':
+            line = line.decode(encoding).encode('utf-8')
+        if line.strip():
+            yield from _get_items(jsonlib.loads(line), keys)
+
+
+def _get_items(value, keys):
+    # Follows the ijson prefix syntax, in which "item" is each entry of an array.
+    if not keys:
+        yield value
+    elif keys[0] == 'item':
+        if isinstance(value, list):
+            for item in value:
+                yield from _get_items(item, keys[1:])
+    elif isinstance(value, dict) and keys[0] in value:
+        yield from _get_items(value[keys[0]], keys[1:])
+
+
+def read_files(paths, prefix='', encoding=None, workers=None, json_lines=False):
+    """
+    Yields the items in files, in the order of the files. If an item is an array, yields each entry of the array.
+
+    :param paths: the paths or glob patterns of the files to read (the files matching a pattern are read in
+        alphabetical order, and the directories matching a pattern are skipped)
+    :param str prefix: the path to the items within each file
+    :param str encoding: the files' encoding (default: UTF-8)
+    :param int workers: the number of worker processes with which to parse files
+    :param bool json_lines: whether the files are JSON Lines, with one JSON value per line
+    """
+    files = [match for path in paths for match in sorted(glob.glob(path, recursive=True)) or [path]
+             if match == path or not os.path.isdir(match)]
+
+    if not workers or workers < 2:
+        for file in files:
+            yield from _read_file(file, prefix, encoding, json_lines)
+        return
+
+    # The next batch is submitted to the pool before the items of the current batch are yielded, so that the workers
+    # aren't idle while the calling code processes the items. Only two batches are parsed at a time, to bound memory.
+    size = workers * 2
+
+    with multiprocessing.Pool(workers) as pool:
+        pending = None
+        for i in range(0, len(files), size):
+            result = pool.map_async(_parse_file, [(file, prefix, encoding, json_lines) for file in files[i:i + size]])
+
+            if pending:
+                for items in pending.get():
+                    yield from items
+
+            pending = result
+
+        if pending:
+            for items in pending.get():
+                yield from items
+
+
+def _parse_file(args):
+    return list(_read_file(*args))
+
+
+def _read_file(path, prefix, encoding, json_lines=False):
+    with open(path, 'rb') as f:
+        if json_lines:
+            items = read_json_lines(f, prefix, encoding)
+        else:
+            if encoding and encoding != 'utf-8':
+                f = io.BytesIO(f.read().decode(encoding).encode('utf-8'))
+            items = ijson.items(f, prefix, multiple_values=True)
+
+        for item in items:
+            if isinstance(item, list):
+                yield from item
+            else:
+                yield item
+
+
 def _detect_format_result(is_concatenated, is_array, has_records, has_releases, has_ocid, has_tag, is_compiled):
     if has_records:
         detected_format = 'record package'
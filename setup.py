@@ -27,9 +27,15 @@ setup(
         'strict-rfc3339',
     ],
     extras_require={
+        'duckdb': [
+            'duckdb',
+        ],
         'perf': [
             'orjson>=3',
         ],
+        'postgresql': [
+            'psycopg2',
+        ],
         'test': [
             'coveralls',
             'pytest',
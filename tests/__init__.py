@@ -1,4 +1,5 @@
 import os.path
+import subprocess
 import sys
 from difflib import ndiff
 from io import BytesIO, StringIO, TextIOWrapper
@@ -28,6 +29,12 @@ def assert_equal(actual, expected, ordered=True):
                 assert ocdskit.util.jsonlib.loads(a) == ocdskit.util.jsonlib.loads(b), '\n{}\n{}'.format(a, b)
 
 
+# sqlite3 is hidden in a new process, like in a Python build without it.
+def run_without_sqlite3(args):
+    code = "import sys; sys.modules['sqlite3'] = None; from ocdskit.cli.__main__ import main; main()"
+    return subprocess.run([sys.executable, '-c', code] + args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
 @patch('sys.stdout', new_callable=StringIO)
 def run_command(monkeypatch, main, args, stdout):
     monkeypatch.setattr(sys, 'argv', ['ocdskit'] + args)
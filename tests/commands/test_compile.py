@@ -1,12 +1,21 @@
 import json
 import logging
+import os
+import sys
+from collections import OrderedDict
+from io import BytesIO, TextIOWrapper
+from unittest.mock import patch
 
 import pytest
 
+import ocdskit.cli.commands.base
 import ocdskit.combine
+import ocdskit.packager
 from ocdskit.cli.__main__ import main
+from ocdskit.store import ReleaseStore
+from ocdskit.upgrade import upgrade_10_11
 from ocdskit.util import json_dumps
-from tests import assert_streaming, assert_streaming_error, read, run_streaming
+from tests import assert_streaming, assert_streaming_error, path, read, run_streaming, run_without_sqlite3
 
 
 def _remove_package_metadata(filenames):
@@ -138,8 +147,21 @@ def test_command_version_mismatch(monkeypatch, caplog):
         assert len(caplog.records) == 1
         assert caplog.records[0].levelname == 'CRITICAL'
         assert caplog.records[0].message == "item 1: version error: this item uses version 1.0, but earlier items " \
-            "used version 1.1\nTry first upgrading items to the same version:\n  cat file [file ...] | ocdskit " \
-            "upgrade 1.0:1.1 | ocdskit compile --package --versioned"
+            "used version 1.1\nTry upgrading items to the same version:\n  cat file [file ...] | ocdskit compile " \
+            "--upgrade --package --versioned"
+
+
+@pytest.mark.vcr()
+@pytest.mark.usefixtures('sqlite')
+def test_command_upgrade(monkeypatch):
+    package = upgrade_10_11(json.loads(read('realdata/release-package_1.0-1.json'), object_pairs_hook=OrderedDict))
+    stdin = read('realdata/release-package_1.1-1.json', 'rb') + json_dumps(package).encode()
+
+    expected = run_streaming(monkeypatch, main, ['compile', '--package', '--versioned'], stdin)
+    actual = run_streaming(monkeypatch, main, ['compile', '--package', '--versioned', '--upgrade'],
+                           ['realdata/release-package_1.1-1.json', 'realdata/release-package_1.0-1.json'])
+
+    assert json.loads(actual) == json.loads(expected)
 
 
 @pytest.mark.vcr()
@@ -157,7 +179,7 @@ def test_command_missing_ocid(monkeypatch, caplog):
 
 @pytest.mark.vcr()
 def test_command_without_sqlite(monkeypatch, caplog):
-    ocdskit.combine.sqlite = False
+    monkeypatch.setattr(ocdskit.packager, 'USING_SQLITE', False)
 
     # To check the warning, not the output.
     run_streaming(monkeypatch, main, ['compile'], ['release-package_minimal.json'])
@@ -166,3 +188,614 @@ def test_command_without_sqlite(monkeypatch, caplog):
     assert caplog.records[0].levelname == 'WARNING'
     assert caplog.records[0].message == 'sqlite3 is unavailable, so the command will run in memory. If input files ' \
                                         'are too large, the command might exceed available memory.'
+
+
+@pytest.mark.vcr()
+@pytest.mark.usefixtures('sqlite')
+def test_command_workers(monkeypatch):
+    assert_compile_command(monkeypatch, main, ['--ascii', 'compile', '--workers', '2'],
+                           ['realdata/release-package-1.json', 'realdata/release-package-2.json'],
+                           ['realdata/compiled-release-1.json', 'realdata/compiled-release-2.json'])
+
+
+@pytest.mark.vcr()
+@pytest.mark.usefixtures('sqlite')
+def test_command_workers_package_versioned(monkeypatch):
+    assert_compile_command(monkeypatch, main, ['compile', '--package', '--versioned', '--workers', '2'],
+                           ['realdata/release-package-1.json', 'realdata/release-package-2.json'],
+                           ['realdata/record-package_versioned.json'], remove_package_metadata=True)
+
+
+@pytest.mark.vcr()
+@pytest.mark.parametrize('backend', ['python', 'sqlite', 'external-sort', 'partitioned'])
+def test_command_backend(backend, monkeypatch):
+    assert_compile_command(monkeypatch, main, ['--ascii', 'compile', '--backend', backend],
+                           ['realdata/release-package-1.json', 'realdata/release-package-2.json'],
+                           ['realdata/compiled-release-1.json', 'realdata/compiled-release-2.json'])
+
+
+@pytest.mark.parametrize('partitions', ['1', '3'])
+def test_command_partitions(partitions, monkeypatch):
+    partitioned_backend = ocdskit.packager.PartitionedBackend
+    files = []
+
+    def backend(**kwargs):
+        instance = partitioned_backend(**kwargs)
+        files.append(len(instance.files))
+        return instance
+
+    monkeypatch.setitem(ocdskit.packager.BACKENDS, 'partitioned', backend)
+
+    actual = run_streaming(monkeypatch, main, ['compile', '--schema', path('release-schema.json'), '--backend',
+                                               'partitioned', '--partitions', partitions],
+                           ['realdata/release-package-1.json', 'realdata/release-package-2.json'])
+
+    assert [json.loads(line)['ocid'] for line in actual.splitlines()] == [
+        'OCDS-87SD3T-AD-SF-DRM-063-2015', 'OCDS-87SD3T-AD-SF-DRM-065-2015']
+    assert files == [int(partitions)]
+
+
+@pytest.mark.parametrize('args,message', [
+    (['--partitions', '4'], '--partitions requires the partitioned backend'),
+    (['--backend', 'sqlite', '--partitions', '4'], '--partitions requires the partitioned backend'),
+    (['--backend', 'partitioned', '--partitions', '0'], '--partitions must be a positive integer'),
+    (['--memory-limit', '1000', '--partitions', '4'], "--memory-limit can't be used with --partitions"),
+])
+def test_command_partitions_error(args, message, monkeypatch, caplog):
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, ['compile'] + args, ['release-package_minimal.json'])
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].levelname == 'CRITICAL'
+        assert caplog.records[0].message == message
+
+
+@pytest.mark.vcr()
+@pytest.mark.parametrize('compression', ['zlib', 'lzma'])
+def test_command_compression(compression, monkeypatch):
+    assert_compile_command(monkeypatch, main, ['--ascii', 'compile', '--backend', 'sqlite', '--compression',
+                                               compression, '--compression-level', '1'],
+                           ['realdata/release-package-1.json', 'realdata/release-package-2.json'],
+                           ['realdata/compiled-release-1.json', 'realdata/compiled-release-2.json'])
+
+
+@pytest.mark.parametrize('args,message', [
+    (['--compression', 'zlib', '--compression-level', '10'], '--compression-level must be between -1 and 9 for zlib'),
+    (['--compression', 'lzma', '--compression-level', '-1'], '--compression-level must be between 0 and 9 for lzma'),
+    (['--compression-level', '1'], '--compression-level requires --compression'),
+])
+def test_command_compression_level_error(args, message, monkeypatch, caplog):
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, ['compile', '--backend', 'sqlite'] + args,
+                               ['release-package_minimal.json'])
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].levelname == 'CRITICAL'
+        assert caplog.records[0].message == message
+
+
+def test_command_compression_backend(monkeypatch, caplog):
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, ['compile', '--backend', 'python', '--compression', 'zlib'],
+                               ['release-package_minimal.json'])
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].levelname == 'CRITICAL'
+        assert caplog.records[0].message == '--compression requires the sqlite backend'
+
+
+@pytest.mark.vcr()
+def test_command_state(monkeypatch, tmpdir):
+    state = str(tmpdir.join('state.db'))
+
+    assert_streaming(monkeypatch, main, ['--ascii', 'compile', '--backend', 'sqlite', '--state', state],
+                     ['realdata/release-package-1.json'], ['realdata/compiled-release-1.json'])
+    assert_streaming(monkeypatch, main, ['--ascii', 'compile', '--backend', 'sqlite', '--state', state],
+                     ['realdata/release-package-2.json'], ['realdata/compiled-release-2.json'])
+    assert_streaming(monkeypatch, main, ['--ascii', 'compile', '--backend', 'sqlite', '--state', state, '--all-ocids'],
+                     ['realdata/release-package-1.json'],
+                     ['realdata/compiled-release-1.json', 'realdata/compiled-release-2.json'])
+
+
+def test_command_state_duplicates(monkeypatch, tmpdir):
+    args = ['compile', '--schema', path('release-schema.json'), '--backend', 'sqlite', '--state',
+            str(tmpdir.join('state.db'))]
+
+    # Releases that are already in the database are ignored, and their OCIDs aren't printed.
+    assert run_streaming(monkeypatch, main, args, ['realdata/release-package-1.json']) != ''
+    assert run_streaming(monkeypatch, main, args, ['realdata/release-package-1.json']) == ''
+    assert run_streaming(monkeypatch, main, args, ['realdata/release-package-1.json']) == ''
+
+    actual = run_streaming(monkeypatch, main, args + ['--all-ocids', '--package', '--versioned'],
+                           ['realdata/release-package-1.json'])
+
+    assert [len(record['releases']) for record in json.loads(actual)['records']] == [2]
+
+
+def test_command_state_version(monkeypatch, caplog, tmpdir):
+    args = ['compile', '--schema', path('release-schema.json'), '--backend', 'sqlite', '--state',
+            str(tmpdir.join('state.db'))]
+
+    run_streaming(monkeypatch, main, args, ['release-package_minimal.json'])
+
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, args, ['release_1.0.json'])
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].levelname == 'CRITICAL'
+        assert caplog.records[0].message.startswith('item 0: version error: this item uses version 1.0, but earlier '
+                                                    'items used version 1.1\nTry upgrading items to the same version')
+
+
+def test_command_state_backend(monkeypatch, caplog, tmpdir):
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, ['compile', '--backend', 'python', '--state',
+                                                   str(tmpdir.join('state.db'))], ['release-package_minimal.json'])
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].levelname == 'CRITICAL'
+        assert caplog.records[0].message == '--state requires the sqlite backend'
+
+
+@pytest.mark.parametrize('deduplicate', ['content', 'id'])
+def test_command_deduplicate(deduplicate, monkeypatch, caplog):
+    with caplog.at_level(logging.INFO):
+        assert_streaming(monkeypatch, main, ['--ascii', 'compile', '--deduplicate', deduplicate],
+                         ['realdata/release-package-1.json', 'realdata/release-package-1.json'],
+                         ['realdata/compiled-release-1.json'])
+
+        assert '2 duplicate releases were dropped' in [record.message for record in caplog.records]
+
+
+@pytest.mark.parametrize('args,expected', [
+    ([], ''),
+    (['--verbose'], 'Using PythonBackend, because it was requested\n2 duplicate releases were dropped\n'),
+])
+def test_command_deduplicate_verbose(args, expected, monkeypatch, capsys):
+    run_streaming(monkeypatch, main, args + ['compile', '--schema', path('release-schema.json'), '--backend', 'python',
+                                             '--deduplicate', 'content'],
+                  ['realdata/release-package-1.json', 'realdata/release-package-1.json'])
+
+    assert capsys.readouterr().err == expected
+    assert logging.getLogger('ocdskit').handlers == []
+
+
+def test_command_ocid(monkeypatch):
+    assert_streaming(monkeypatch, main, ['--ascii', 'compile', '--ocid', 'OCDS-87SD3T-AD-SF-DRM-065-2015'],
+                     ['realdata/release-package-1.json', 'realdata/release-package-2.json'],
+                     ['realdata/compiled-release-2.json'])
+
+
+def test_command_ocid_file(monkeypatch, tmpdir):
+    ocid_file = tmpdir.join('ocids.txt')
+    ocid_file.write('OCDS-87SD3T-AD-SF-DRM-063-2015\n\nOCDS-87SD3T-AD-SF-DRM-999-2015\n')
+
+    assert_streaming(monkeypatch, main, ['--ascii', 'compile', '--ocid-file', str(ocid_file), '--ocid',
+                                         'OCDS-87SD3T-AD-SF-DRM-065-2015'],
+                     ['realdata/release-package-1.json', 'realdata/release-package-2.json'],
+                     ['realdata/compiled-release-1.json', 'realdata/compiled-release-2.json'])
+
+
+@pytest.mark.parametrize('args,message', [
+    (['--ocid-file', '{}/missing.txt'], 'No such file or directory: {}/missing.txt'),
+    (['--ocid-file', '{}'], 'Is a directory: {}'),
+    (['--ocid', 'ocds-213czf-1', '--state', '{}/state.db'], "--ocid can't be used with --state"),
+    (['--ocid', 'ocds-213czf-1', '--ocid-file', '{}/ocids.txt', '--checkpoint', '{}/checkpoint.db'],
+     "--ocid and --ocid-file can't be used with --checkpoint"),
+])
+def test_command_ocid_error(args, message, monkeypatch, caplog, tmpdir):
+    args = [arg.format(tmpdir) for arg in args]
+
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, ['compile', '--backend', 'sqlite'] + args,
+                               ['release-package_minimal.json'])
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].levelname == 'CRITICAL'
+        assert caplog.records[0].message == message.format(tmpdir)
+    assert not tmpdir.listdir()
+
+
+@pytest.mark.vcr()
+def test_command_incremental(monkeypatch):
+    assert_compile_command(monkeypatch, main, ['--ascii', 'compile', '--incremental'],
+                           ['realdata/release-package-1.json', 'realdata/release-package-2.json'],
+                           ['realdata/compiled-release-1.json', 'realdata/compiled-release-2.json'])
+
+
+def test_command_incremental_package(monkeypatch, caplog):
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, ['compile', '--incremental', '--package'],
+                               ['release-package_minimal.json'])
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].levelname == 'CRITICAL'
+        assert caplog.records[0].message == "--incremental can't be used with --package"
+
+
+@pytest.mark.vcr()
+@pytest.mark.parametrize('versioned', [False, True])
+def test_command_output_db(versioned, monkeypatch, tmpdir):
+    database = str(tmpdir.join('releases.db'))
+    args = ['compile', '--output-db', database]
+    if versioned:
+        args.append('--versioned')
+        filename = 'realdata/versioned-release-{}.json'
+    else:
+        filename = 'realdata/compiled-release-{}.json'
+
+    assert run_streaming(monkeypatch, main, args, ['realdata/release-package-1.json',
+                                                   'realdata/release-package-2.json']) == ''
+
+    with ReleaseStore(database, versioned=versioned) as store:
+        assert list(store.find()) == [json.loads(read(filename.format(i))) for i in (1, 2)]
+
+
+def test_command_output_db_package(monkeypatch, caplog, tmpdir):
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, ['compile', '--output-db', str(tmpdir.join('releases.db')),
+                                                   '--package'], ['release-package_minimal.json'])
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].levelname == 'CRITICAL'
+        assert caplog.records[0].message == "--output-db can't be used with --package"
+
+
+def test_command_without_sqlite3():
+    process = run_without_sqlite3(['compile', '--schema', path('release-schema.json'),
+                                   path('release-package_minimal.json')])
+
+    assert process.returncode == 0
+    assert b'sqlite3 is unavailable, so the command will run in memory.' in process.stderr
+    assert json.loads(process.stdout)['ocid'] == 'ocds-213czf-1'
+
+
+@pytest.mark.parametrize('args,message', [
+    (['--output-db', '{}/releases.db'], b"sqlite3 is unavailable, so --output-db can't be used"),
+    (['--backend', 'sqlite'], b"sqlite3 is unavailable, so the sqlite backend can't be used"),
+])
+def test_command_without_sqlite3_error(args, message, tmpdir):
+    args = [arg.format(tmpdir) for arg in args]
+
+    process = run_without_sqlite3(['compile'] + args + [path('release-package_minimal.json')])
+
+    assert process.returncode == 1
+    assert message in process.stderr
+    assert not tmpdir.listdir()
+
+
+def test_command_as_of_changed_since(monkeypatch):
+    actual = run_streaming(monkeypatch, main, ['compile', '--as-of', '2016-01-01', '--changed-since', '2015-12-20'],
+                           ['realdata/release-package-1.json', 'realdata/release-package-2.json'])
+
+    releases = [json.loads(line) for line in actual.splitlines()]
+
+    assert [(release['ocid'], release['date']) for release in releases] == [
+        ('OCDS-87SD3T-AD-SF-DRM-063-2015', '2015-12-22T00:00:00-06:00'),
+    ]
+
+
+@pytest.mark.parametrize('workers', ['1', '2'])
+def test_command_files(workers, monkeypatch):
+    assert_streaming(monkeypatch, main, ['--ascii', 'compile', '--workers', workers,
+                                         path('realdata/release-package-2.json'),
+                                         path('realdata/release-package-[1].json')], b'',
+                     ['realdata/compiled-release-1.json', 'realdata/compiled-release-2.json'])
+
+
+def test_command_jsonl(monkeypatch):
+    assert_compile_command(monkeypatch, main, ['--ascii', '--jsonl', 'compile'],
+                           ['realdata/release-package-1.json', 'realdata/release-package-2.json'],
+                           ['realdata/compiled-release-1.json', 'realdata/compiled-release-2.json'])
+
+
+@pytest.mark.parametrize('workers', ['1', '2'])
+def test_command_files_jsonl(workers, monkeypatch):
+    assert_streaming(monkeypatch, main, ['--ascii', '--jsonl', 'compile', '--workers', workers,
+                                         path('realdata/release-package-2.json'),
+                                         path('realdata/release-package-[1].json')], b'',
+                     ['realdata/compiled-release-1.json', 'realdata/compiled-release-2.json'])
+
+
+def test_command_files_version_mismatch(monkeypatch, caplog):
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, ['compile', '--workers', '2',
+                                                   path('realdata/release-package_1.1-*.json'),
+                                                   path('realdata/release-package_1.0-1.json')], b'')
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].message.startswith('item 2: version error: this item uses version 1.0, but earlier '
+                                                    'items used version 1.1\n')
+
+
+def test_command_files_missing(monkeypatch, caplog):
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, ['compile', 'nonexistent.json'], b'')
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].message == 'No such file or directory: nonexistent.json'
+
+
+def test_command_files_directory(monkeypatch, caplog, tmpdir):
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, ['compile', str(tmpdir)], b'')
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].message == 'Is a directory: {}'.format(tmpdir)
+
+
+def test_command_hashes(monkeypatch, tmpdir):
+    hashes = [str(tmpdir.join('hashes-{}.tsv'.format(i))) for i in range(3)]
+
+    assert_streaming(monkeypatch, main, ['--ascii', 'compile', '--hashes', hashes[0]],
+                     ['realdata/release-package-1.json', 'realdata/release-package-2.json'],
+                     ['realdata/compiled-release-1.json', 'realdata/compiled-release-2.json'])
+    assert run_streaming(monkeypatch, main, ['compile', '--previous-hashes', hashes[0], '--hashes', hashes[1]],
+                         ['realdata/release-package-1.json', 'realdata/release-package-2.json']) == ''
+    assert run_streaming(monkeypatch, main, ['compile', '--previous-hashes', hashes[1], '--hashes', hashes[2]],
+                         ['realdata/release-package-2.json']) == ''
+
+    with open(hashes[0]) as f:
+        lines = f.read().splitlines()
+
+    assert [line.split('\t')[0] for line in lines] == ['OCDS-87SD3T-AD-SF-DRM-063-2015',
+                                                       'OCDS-87SD3T-AD-SF-DRM-065-2015']
+    for filename in hashes[1:]:
+        with open(filename) as f:
+            assert f.read().splitlines() == lines
+        assert not os.path.exists(filename + '.tmp')
+
+
+@pytest.mark.parametrize('args,message', [
+    (['--package'], "--hashes can't be used with --package"),
+    (['--checkpoint', '{}/checkpoint.db'], "--hashes can't be used with --checkpoint"),
+])
+def test_command_hashes_error(args, message, monkeypatch, caplog, tmpdir):
+    args = [arg.format(tmpdir) for arg in args]
+
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, ['compile', '--hashes', str(tmpdir.join('hashes.tsv'))] + args,
+                               ['release-package_minimal.json'])
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].message == message
+    assert not tmpdir.listdir()
+
+
+@pytest.mark.parametrize('workers', ['1', '2'])
+def test_command_grouped_input(workers, monkeypatch):
+    assert_streaming(monkeypatch, main, ['--ascii', 'compile', '--grouped-input', '--workers', workers],
+                     ['realdata/release-package-1.json', 'realdata/release-package-2.json'],
+                     ['realdata/compiled-release-1.json', 'realdata/compiled-release-2.json'])
+
+
+def test_command_grouped_input_unsorted(monkeypatch, caplog):
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, ['compile', '--grouped-input'],
+                               ['realdata/release-package-2.json', 'realdata/release-package-1.json'])
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].message == 'OCID OCDS-87SD3T-AD-SF-DRM-063-2015 is after OCID ' \
+                                            'OCDS-87SD3T-AD-SF-DRM-065-2015, but the input must be sorted by OCID. ' \
+                                            'Unset --grouped-input, or sort the input.'
+
+
+def test_command_grouped_input_package(monkeypatch, caplog):
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, ['compile', '--grouped-input', '--package', '--backend', 'python'],
+                               ['release-package_minimal.json'])
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].message == "--grouped-input can't be used with --package or --backend"
+
+
+def test_command_checkpoint(monkeypatch, tmpdir):
+    checkpoint = str(tmpdir.join('checkpoint.db'))
+
+    assert_streaming(monkeypatch, main, ['--ascii', 'compile', '--checkpoint', checkpoint],
+                     ['realdata/release-package-1.json', 'realdata/release-package-2.json'],
+                     ['realdata/compiled-release-1.json', 'realdata/compiled-release-2.json'])
+    assert run_streaming(monkeypatch, main, ['compile', '--checkpoint', checkpoint, '--resume'], b'') == ''
+
+
+def test_command_checkpoint_resume(monkeypatch, tmpdir):
+    checkpoint = str(tmpdir.join('checkpoint.db'))
+
+    # Simulate the command stopping after printing the first compiled release.
+    monkeypatch.setattr(ocdskit.combine, 'CHECKPOINT_INTERVAL', 1)
+    print_ = ocdskit.cli.commands.base.BaseCommand.print
+    count = []
+
+    def print_once(self, *args, **kwargs):
+        if count:
+            raise KeyboardInterrupt
+        count.append(1)
+        print_(self, *args, **kwargs)
+
+    with monkeypatch.context() as m:
+        m.setattr(ocdskit.cli.commands.base.BaseCommand, 'print', print_once)
+        with pytest.raises(KeyboardInterrupt):
+            run_streaming(monkeypatch, main, ['compile', '--checkpoint', checkpoint],
+                          ['realdata/release-package-1.json', 'realdata/release-package-2.json'])
+
+    assert_streaming(monkeypatch, main, ['--ascii', 'compile', '--checkpoint', checkpoint, '--resume'], b'',
+                     ['realdata/compiled-release-2.json'])
+
+
+def _written_ocids(stdout):
+    return [json.loads(line)['ocid'] for line in stdout.buffer.getvalue().splitlines()]
+
+
+def test_command_checkpoint_written(monkeypatch, tmpdir):
+    stdin = read('realdata/release-package-1.json', 'rb') + read('realdata/release-package-2.json', 'rb')
+    stdout = TextIOWrapper(BytesIO())
+    save_checkpoint = ocdskit.packager.SQLiteBackend.save_checkpoint
+    saved = []
+
+    # Record the OCIDs written to standard output when each checkpoint is saved.
+    def record(self, data):
+        if data['ocid']:
+            saved.append((data['ocid'], _written_ocids(stdout)))
+        save_checkpoint(self, data)
+
+    monkeypatch.setattr(ocdskit.combine, 'CHECKPOINT_INTERVAL', 1)
+    monkeypatch.setattr(ocdskit.packager.SQLiteBackend, 'save_checkpoint', record)
+
+    with patch('sys.stdin', TextIOWrapper(BytesIO(stdin))), patch('sys.stdout', stdout):
+        monkeypatch.setattr(sys, 'argv', ['ocdskit', 'compile', '--schema', path('release-schema.json'),
+                                          '--checkpoint', str(tmpdir.join('checkpoint.db'))])
+        main()
+
+    assert saved
+    for ocid, written in saved:
+        assert ocid in written
+
+
+def test_command_state_written(monkeypatch, tmpdir):
+    stdin = read('realdata/release-package-1.json', 'rb') + read('realdata/release-package-2.json', 'rb')
+    stdout = TextIOWrapper(BytesIO())
+    get_releases_by_ocid = ocdskit.packager.SQLiteBackend.get_releases_by_ocid
+    committed = []
+
+    # Record the OCIDs written to standard output when the state is committed, after the last OCID is yielded.
+    def record(self, *args, **kwargs):
+        yield from get_releases_by_ocid(self, *args, **kwargs)
+        committed.append(_written_ocids(stdout))
+
+    monkeypatch.setattr(ocdskit.packager.SQLiteBackend, 'get_releases_by_ocid', record)
+
+    with patch('sys.stdin', TextIOWrapper(BytesIO(stdin))), patch('sys.stdout', stdout):
+        monkeypatch.setattr(sys, 'argv', ['ocdskit', 'compile', '--schema', path('release-schema.json'),
+                                          '--backend', 'sqlite', '--state', str(tmpdir.join('state.db'))])
+        main()
+
+    assert committed == [['OCDS-87SD3T-AD-SF-DRM-063-2015', 'OCDS-87SD3T-AD-SF-DRM-065-2015']]
+
+
+@pytest.mark.parametrize('args,message', [
+    (['--checkpoint', '{}/checkpoint.db', '--package'], "--checkpoint can't be used with --package"),
+    (['--checkpoint', '{}/checkpoint.db', '--state', '{}/state.db'], "--checkpoint can't be used with --state"),
+    (['--checkpoint', '{}/checkpoint.db', '--output-db', '{}/releases.db'],
+     "--checkpoint can't be used with --output-db"),
+    (['--checkpoint', '{}/checkpoint.db', '--backend', 'python'], '--checkpoint requires the sqlite backend'),
+    (['--resume'], '--resume requires --checkpoint'),
+])
+def test_command_checkpoint_error(args, message, monkeypatch, caplog, tmpdir):
+    args = [arg.format(tmpdir) for arg in args]
+
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, ['compile'] + args, ['release-package_minimal.json'])
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].levelname == 'CRITICAL'
+        assert caplog.records[0].message == message
+
+
+def test_command_checkpoint_exists(monkeypatch, caplog, tmpdir):
+    checkpoint = tmpdir.join('checkpoint.db')
+    checkpoint.write('')
+
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, ['compile', '--checkpoint', str(checkpoint)],
+                               ['release-package_minimal.json'])
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].message == '{} already exists. Set --resume to resume from its checkpoint, or ' \
+                                            'delete it.'.format(checkpoint)
+
+
+def test_command_checkpoint_resume_missing(monkeypatch, caplog, tmpdir):
+    checkpoint = str(tmpdir.join('checkpoint.db'))
+
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, ['compile', '--checkpoint', checkpoint, '--resume'], b'')
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].message == 'No such file or directory: {}'.format(checkpoint)
+    assert not os.path.exists(checkpoint)
+
+
+def test_command_checkpoint_missing(monkeypatch, caplog, tmpdir):
+    checkpoint = str(tmpdir.join('checkpoint.db'))
+
+    # The command stopped before reading all of standard input.
+    ocdskit.packager.SQLiteBackend(path=checkpoint).close()
+
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, ['compile', '--checkpoint', checkpoint, '--resume'], b'')
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].message == '{} has no checkpoint, because the command stopped before reading all ' \
+                                            'of standard input. Delete it and run the command again without ' \
+                                            '--resume.'.format(checkpoint)
+
+
+@pytest.mark.vcr()
+@pytest.mark.skipif(not os.getenv('OCDSKIT_TEST_DATABASE_URL'), reason='OCDSKIT_TEST_DATABASE_URL is not set')
+def test_command_backend_postgresql(monkeypatch):
+    assert_compile_command(monkeypatch, main, ['--ascii', 'compile', '--backend',
+                                               os.getenv('OCDSKIT_TEST_DATABASE_URL')],
+                           ['realdata/release-package-1.json', 'realdata/release-package-2.json'],
+                           ['realdata/compiled-release-1.json', 'realdata/compiled-release-2.json'])
+
+
+@pytest.mark.vcr()
+@pytest.mark.skipif(not ocdskit.packager.USING_DUCKDB, reason='duckdb is unavailable')
+def test_command_backend_duckdb(monkeypatch):
+    assert_compile_command(monkeypatch, main, ['--ascii', 'compile', '--backend', 'duckdb'],
+                           ['realdata/release-package-1.json', 'realdata/release-package-2.json'],
+                           ['realdata/compiled-release-1.json', 'realdata/compiled-release-2.json'])
+
+
+def test_command_backend_duckdb_unavailable(monkeypatch, caplog):
+    monkeypatch.setattr(ocdskit.packager, 'USING_DUCKDB', False)
+
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, ['compile', '--backend', 'duckdb'], ['release-package_minimal.json'])
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].levelname == 'CRITICAL'
+        assert caplog.records[0].message == 'duckdb is unavailable. Install it with: pip install ocdskit[duckdb]'
+
+
+def test_command_backend_unknown(monkeypatch, caplog):
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, ['compile', '--backend', 'nonexistent'],
+                               ['release-package_minimal.json'])
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].levelname == 'CRITICAL'
+        assert caplog.records[0].message == '--backend must be one of compact, duckdb, external-sort, partitioned, ' \
+                                            'python, sqlite, or a PostgreSQL connection URI'
+
+
+@pytest.mark.vcr()
+@pytest.mark.parametrize('memory_limit', ['1K', '1G'])
+def test_command_memory_limit(memory_limit, monkeypatch):
+    assert_compile_command(monkeypatch, main, ['--ascii', 'compile', '--memory-limit', memory_limit],
+                           ['realdata/release-package-1.json', 'realdata/release-package-2.json'],
+                           ['realdata/compiled-release-1.json', 'realdata/compiled-release-2.json'])
+
+
+def test_command_memory_limit_verbose(monkeypatch, caplog):
+    with caplog.at_level(logging.INFO):
+        run_streaming(monkeypatch, main, ['compile', '--schema', path('release-schema.json'), '--memory-limit', '1K'],
+                      ['realdata/release-package-1.json', 'realdata/release-package-2.json'])
+
+        messages = [record.message for record in caplog.records]
+
+        assert messages[0] == 'Using CompactBackend, because the memory budget (1024 bytes) is not yet exceeded'
+        assert messages[1].startswith('Using SQLiteBackend, because the memory usage (')
+        # The counters are of the backend to which releases were moved.
+        assert messages[2].endswith(' bytes of releases were written to the SQLite database')
+        assert messages[3].startswith('4 releases were buffered and written in ')
+
+
+def test_command_memory_limit_backend(monkeypatch, caplog):
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, ['compile', '--memory-limit', '1G', '--backend', 'sqlite'],
+                               ['release-package_minimal.json'])
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].levelname == 'CRITICAL'
+        assert caplog.records[0].message == "--memory-limit can't be used with --backend"
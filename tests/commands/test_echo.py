@@ -2,7 +2,7 @@ import logging
 import re
 import sys
 from io import BytesIO, StringIO, TextIOWrapper
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 import pytest
 
@@ -90,3 +90,82 @@ def test_command_invalid_json(monkeypatch, caplog):
         assert len(caplog.records) == 1
         assert caplog.records[0].levelname == 'CRITICAL'
         assert caplog.records[0].message.startswith('JSON error: ')
+
+
+def test_command_jsonl(monkeypatch):
+    assert_streaming(monkeypatch, main, ['--jsonl', 'echo'],
+                     ['release-package_minimal.json', 'realdata/release-package_encoding-utf-8.json'],
+                     ['release-package_minimal.json', 'realdata/release-package_encoding-utf-8.json'])
+
+
+def test_command_jsonl_blank_lines(monkeypatch):
+    stdin = b'{"ocid":"x"}\n\n  \n[{"ocid":"y"},{"ocid":"z"}]'
+
+    actual = run_streaming(monkeypatch, main, ['--jsonl', 'echo'], stdin)
+
+    assert actual == '{"ocid":"x"}\n{"ocid":"y"}\n{"ocid":"z"}\n'
+
+
+def test_command_jsonl_encoding(monkeypatch):
+    assert_streaming(monkeypatch, main, ['--encoding', 'iso-8859-1', '--jsonl', 'echo'],
+                     ['realdata/release-package_encoding-iso-8859-1.json'],
+                     ['realdata/release-package_encoding-utf-8.json'])
+
+
+def test_command_jsonl_bad_encoding_iso_8859_1(monkeypatch, caplog):
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, ['--jsonl', 'echo'],
+                               ['realdata/release-package_encoding-iso-8859-1.json'])
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].levelname == 'CRITICAL'
+        assert caplog.records[0].message.startswith('encoding error: ')
+        assert caplog.records[0].message.endswith('\nTry `--encoding iso-8859-1`?')
+
+
+def test_command_jsonl_invalid_json(monkeypatch, caplog):
+    with caplog.at_level(logging.ERROR):
+        stdin = read('release-package_minimal.json', 'rb') + b'{\n'
+
+        assert_streaming_error(monkeypatch, main, ['--jsonl', 'echo'], stdin,
+                               expected=read('release-package_minimal.json'))
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].levelname == 'CRITICAL'
+        assert caplog.records[0].message.startswith('JSON error: ')
+
+
+def test_command_jsonl_output(monkeypatch):
+    assert_streaming(monkeypatch, main, ['--jsonl-output', 'echo'],
+                     ['release_minimal_pretty.json'], ['release_minimal.json'])
+
+
+def test_command_jsonl_output_pretty(monkeypatch, caplog):
+    with caplog.at_level(logging.ERROR):
+        assert_streaming_error(monkeypatch, main, ['--jsonl-output', '--pretty', 'echo'],
+                               ['release_minimal.json'])
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].levelname == 'CRITICAL'
+        assert caplog.records[0].message == "--jsonl-output can't be used with --pretty"
+
+
+def test_command_line_buffered(monkeypatch):
+    assert_streaming(monkeypatch, main, ['--line-buffered', 'echo'],
+                     ['release-package_minimal.json', 'release_minimal.json'],
+                     ['release-package_minimal.json', 'release_minimal.json'])
+
+
+@pytest.mark.parametrize('args,writes', [([], 1), (['--line-buffered'], 2)])
+def test_command_binary_stdout(args, writes, monkeypatch):
+    stdin = read('release-package_minimal.json', 'rb') + read('release_minimal.json', 'rb')
+    stdout = TextIOWrapper(BytesIO())
+    write = Mock(wraps=stdout.buffer.write)
+    monkeypatch.setattr(stdout.buffer, 'write', write)
+
+    with patch('sys.stdin', TextIOWrapper(BytesIO(stdin))), patch('sys.stdout', stdout):
+        monkeypatch.setattr(sys, 'argv', ['ocdskit'] + args + ['echo'])
+        main()
+
+        assert stdout.buffer.getvalue() == stdin
+        assert write.call_count == writes
@@ -0,0 +1,110 @@
+import json
+import logging
+
+import pytest
+
+from ocdskit.cli.__main__ import main
+from ocdskit.store import ReleaseStore
+from tests import assert_command, assert_command_error, path, read, run_command, run_streaming, run_without_sqlite3
+
+
+@pytest.fixture()
+def database(monkeypatch, tmpdir):
+    database = str(tmpdir.join('releases.db'))
+
+    run_streaming(monkeypatch, main, ['compile', '--output-db', database],
+                  ['realdata/release-package-1.json', 'realdata/release-package-2.json'])
+
+    return database
+
+
+@pytest.mark.vcr()
+def test_command(database, monkeypatch, caplog):
+    with caplog.at_level(logging.WARNING):
+        assert_command(monkeypatch, main, ['--ascii', 'lookup', database, 'OCDS-87SD3T-AD-SF-DRM-065-2015',
+                                           'OCDS-87SD3T-AD-SF-DRM-999-2015', 'OCDS-87SD3T-AD-SF-DRM-063-2015'],
+                       read('realdata/compiled-release-2.json') + read('realdata/compiled-release-1.json'))
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].levelname == 'WARNING'
+        assert caplog.records[0].message == 'OCDS-87SD3T-AD-SF-DRM-999-2015: not found'
+
+
+@pytest.mark.vcr()
+def test_command_find(database, monkeypatch):
+    assert_command(monkeypatch, main, ['--ascii', 'lookup', database, '--tag', 'compiled'],
+                   read('realdata/compiled-release-1.json') + read('realdata/compiled-release-2.json'))
+    assert run_command(monkeypatch, main, ['lookup', database, '--date-to', '2017']) == ''
+
+
+def test_command_ocids_and_options(monkeypatch, caplog, tmpdir):
+    database = tmpdir.join('releases.db')
+    database.write('')
+
+    with caplog.at_level(logging.ERROR):
+        assert_command_error(monkeypatch, main, ['lookup', str(database), 'ocds-213czf-1', '--tag', 'tender',
+                                                 '--buyer-id', '1'])
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].levelname == 'CRITICAL'
+        assert caplog.records[0].message == "OCIDs can't be used with --buyer-id or --tag"
+
+
+def test_command_missing(monkeypatch, caplog, tmpdir):
+    database = str(tmpdir.join('missing.db'))
+
+    with caplog.at_level(logging.ERROR):
+        assert_command_error(monkeypatch, main, ['lookup', database])
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].levelname == 'CRITICAL'
+        assert caplog.records[0].message == 'No such file or directory: {}'.format(database)
+
+
+def test_command_invalid(monkeypatch, caplog):
+    database = path('release-package_minimal.json')
+
+    with caplog.at_level(logging.ERROR):
+        assert_command_error(monkeypatch, main, ['lookup', database, 'ocds-213czf-1'])
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].levelname == 'CRITICAL'
+        assert caplog.records[0].message == '{} is not a SQLite database'.format(database)
+
+
+def test_command_versioned(monkeypatch, tmpdir):
+    database = str(tmpdir.join('releases.db'))
+
+    run_streaming(monkeypatch, main, ['compile', '--schema', path('release-schema.json'), '--versioned',
+                                      '--output-db', database], ['realdata/release-package-1-2.json'])
+
+    actual = run_command(monkeypatch, main, ['lookup', database, '--versioned', '--date-from', '2000'])
+
+    assert [json.loads(line)['ocid'] for line in actual.splitlines()] == [
+        'OCDS-87SD3T-AD-SF-DRM-063-2015', 'OCDS-87SD3T-AD-SF-DRM-065-2015']
+
+
+def test_command_versioned_missing(monkeypatch, caplog, tmpdir):
+    database = str(tmpdir.join('releases.db'))
+
+    with ReleaseStore(database) as store:
+        store.add([json.loads(read('realdata/compiled-release-1.json'))])
+
+    with caplog.at_level(logging.ERROR):
+        assert_command_error(monkeypatch, main, ['lookup', database, '--versioned'])
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].levelname == 'CRITICAL'
+        assert caplog.records[0].message == '{} has no versioned releases'.format(database)
+
+    # The database isn't changed.
+    with ReleaseStore(database, readonly=True) as store:
+        assert store.connection.execute("SELECT name FROM sqlite_master WHERE name LIKE 'versioned%'").fetchall() == []
+
+
+def test_command_without_sqlite3(tmpdir):
+    process = run_without_sqlite3(['lookup', str(tmpdir.join('releases.db'))])
+
+    assert process.returncode == 1
+    assert b"sqlite3 is unavailable, so the lookup command can't be used" in process.stderr
+    assert process.stdout == b''
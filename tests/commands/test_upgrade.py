@@ -31,6 +31,14 @@ def test_command_release_package_buyer_procuring_entity_suppliers(monkeypatch, c
     assert len(caplog.records) == 0
 
 
+def test_command_release_package_jsonl(monkeypatch, caplog):
+    assert_streaming(monkeypatch, main, ['--jsonl', 'upgrade', '1.0:1.1'],
+                     ['realdata/release-package_1.0-1.json', 'realdata/release-package_1.0-2.json'],
+                     ['realdata/release-package_1.1-1.json', 'realdata/release-package_1.1-2.json'], ordered=False)
+
+    assert len(caplog.records) == 0
+
+
 def test_command_release_package_transactions(monkeypatch, caplog):
     assert_streaming(monkeypatch, main, ['upgrade', '1.0:1.1'],
                      ['realdata/release-package_1.0-2.json'],
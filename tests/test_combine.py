@@ -1,9 +1,11 @@
+import io
 import json
 
 import pytest
 from ocdsextensionregistry import ProfileBuilder
 
-from ocdskit.combine import compile_release_packages, merge, package_records
+import ocdskit.combine
+from ocdskit.combine import compile_release_packages, filter_changed_releases, get_merger, merge, package_records
 from tests import read
 
 
@@ -42,6 +44,31 @@ def test_merge_without_schema():
     assert compiled_release == json.loads(read('compile_no-extensions.json'))
 
 
+@pytest.mark.vcr()
+def test_merge_merger_cache(monkeypatch):
+    calls = []
+
+    class Merger(ocdskit.combine.Merger):
+        def __init__(self, *args, **kwargs):
+            calls.append(args)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(ocdskit.combine, 'Merger', Merger)
+    ocdskit.combine._get_merger.cache_clear()
+
+    data = json.loads(read('release-package_additional-contact-points.json'))['releases']
+    for _ in range(2):
+        compiled_release = list(merge(data))[0]
+
+        assert compiled_release == json.loads(read('compile_no-extensions.json'))
+
+    assert len(calls) == 1
+    assert get_merger(version='1.1') is get_merger(version='1.1')
+    assert len(calls) == 1
+
+    ocdskit.combine._get_merger.cache_clear()
+
+
 @pytest.mark.vcr()
 def test_compile_release_packages():
     with pytest.warns(DeprecationWarning) as records:
@@ -50,3 +77,16 @@ def test_compile_release_packages():
     assert compiled_releases == []
     assert len(records) == 1
     assert str(records[0].message) == 'compile_release_packages() is deprecated. Use merge() instead.'
+
+
+def test_filter_changed_releases():
+    releases = [{'ocid': 'a', 'value': 1}, {'ocid': 'c', 'value': 1}, {'ocid': 'd', 'value': 1}]
+    previous_hashes = io.StringIO()
+    list(filter_changed_releases([releases[0], {'ocid': 'b'}, {'ocid': 'c', 'value': 2}], hashes=previous_hashes))
+    previous_hashes.seek(0)
+    hashes = io.StringIO()
+
+    actual = list(filter_changed_releases(releases, previous_hashes, hashes))
+
+    assert actual == releases[1:]
+    assert [line.split('\t')[0] for line in hashes.getvalue().splitlines()] == ['a', 'b', 'c', 'd']
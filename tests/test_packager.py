@@ -1,11 +1,18 @@
 import json
+import os
+import tracemalloc
 
 import pytest
 from ocdsmerge import Merger
+from ocdsmerge.exceptions import DuplicateIdValueWarning, NonStringDateValueError, NullDateValueError
 from ocdsmerge.util import get_release_schema_url, get_tags
 
-from ocdskit.packager import Packager
-from tests import read
+import ocdskit.packager
+from ocdskit.exceptions import InconsistentVersionError
+from ocdskit.packager import (CompactBackend, DuckDBBackend, ExternalSortBackend, Packager, PartitionedBackend,
+                              SQLiteBackend)
+from ocdskit.util import json_dumpb
+from tests import path, read
 
 
 @pytest.mark.vcr()
@@ -24,3 +31,372 @@ def test_output_package_no_streaming():
         actual = next(packager.output_package(Merger(schema)))
 
     assert actual == json.loads(read('realdata/record-package_package.json'))
+
+
+def test_output_releases_workers(monkeypatch):
+    monkeypatch.setattr(ocdskit.packager, 'CHUNKSIZE', 1)
+
+    data = [{'ocid': 'ocds-213czf-{}'.format(i % 7), 'id': str(i), 'date': '2001-02-03T04:05:{:02d}Z'.format(i),
+             'tag': ['planning'], 'initiationType': 'tender'} for i in range(20)]
+    merger = Merger(path('release-schema.json'))
+
+    with Packager() as packager:
+        packager.add(data)
+
+        expected = list(packager.output_releases(merger))
+        actual = list(packager.output_releases(merger, workers=2))
+
+    assert [release['ocid'] for release in actual] == sorted('ocds-213czf-{}'.format(i) for i in range(7))
+    assert actual == expected
+
+
+@pytest.mark.parametrize('backend', ['python', 'sqlite'])
+@pytest.mark.parametrize('return_versioned_release', [False, True])
+def test_output_releases_incremental(backend, return_versioned_release):
+    # Dates are out of order, and some are the same.
+    data = [{'ocid': 'ocds-213czf-{}'.format(i % 7), 'id': str(i), 'date': '2001-02-03T04:05:{:02d}Z'.format(-i % 4),
+             'tag': ['tender'], 'title': str(i)} for i in range(20)]
+    merger = Merger(path('release-schema.json'))
+
+    with Packager(backend=backend) as packager:
+        packager.add(data)
+
+        expected = list(packager.output_releases(merger, return_versioned_release=return_versioned_release))
+        actual = list(packager.output_releases(merger, return_versioned_release=return_versioned_release,
+                                               incremental=True))
+
+    assert json_dumpb(actual) == json_dumpb(expected)
+
+
+@pytest.mark.parametrize('date,error', [
+    (None, NullDateValueError),
+    (1, NonStringDateValueError),
+])
+def test_output_releases_incremental_date(date, error):
+    data = [{'ocid': 'ocds-213czf-1', 'id': '1', 'date': '2001-02-03T04:05:06Z'},
+            {'ocid': 'ocds-213czf-1', 'id': '2', 'date': date}]
+    merger = Merger(path('release-schema.json'))
+
+    with Packager(backend='sqlite') as packager:
+        packager.add(data)
+
+        with pytest.raises(error):
+            list(packager.output_releases(merger))
+        with pytest.raises(error):
+            list(packager.output_releases(merger, incremental=True))
+
+
+@pytest.mark.parametrize('filename', ['realdata/release-package-1-2.json', 'realdata/release-package_1.1-2.json'])
+def test_merge_once(filename):
+    data = json.loads(read(filename))['releases']
+    merger = Merger(path('release-schema.json'))
+
+    actual = ocdskit.packager._merge(merger, data, True, True)
+
+    assert actual == (merger.create_compiled_release(data), merger.create_versioned_release(data))
+
+
+@pytest.mark.parametrize('release', [
+    *json.loads(read('realdata/release-package-1-2.json'))['releases'],
+    *json.loads(read('realdata/release-package_1.1-2.json'))['releases'],
+    # `null` values, empty objects and arrays, and objects whose fields are all `null`.
+    {'ocid': 'ocds-213czf-1', 'id': '1', 'date': None, 'tag': ['tender'], 'title': None, 'tender': {'title': None},
+     'planning': {}, 'parties': [{}, {'id': None, 'name': None}, {'name': 'x'}], 'buyer': {'name': ''}},
+    # An `id` that isn't a string, and an array of strings.
+    {'ocid': 'ocds-213czf-1', 'date': '2001-02-03T04:05:06Z', 'parties': [{'name': 'x', 'id': 1, 'roles': ['buyer']}]},
+])
+def test_compile_one(release):
+    merger = Merger(path('release-schema.json'))
+
+    actual = ocdskit.packager._compile_one(merger, release)
+
+    assert json_dumpb(actual) == json_dumpb(merger.create_compiled_release([release]))
+
+
+def test_compile_one_duplicate_id():
+    merger = Merger(path('release-schema.json'))
+    release = {'ocid': 'ocds-213czf-1', 'date': '', 'parties': [{'id': '1', 'name': 'x'}, {'id': 1, 'roles': []}]}
+
+    assert ocdskit.packager._compile_one(merger, release) is None
+    with pytest.warns(DuplicateIdValueWarning):
+        assert ocdskit.packager._merge(merger, [release], True, False) == (
+            merger.create_compiled_release([release]), None)
+
+
+def test_external_sort_backend():
+    data = [{'ocid': 'ocds-213czf-{}'.format(i % 7), 'id': str(i), 'date': ''} for i in range(20)]
+
+    with Packager(backend=ExternalSortBackend(buffer_size=3)) as packager:
+        packager.add(data)
+
+        actual = [(ocid, [row[-1]['id'] for row in rows]) for ocid, rows in packager.backend.get_releases_by_ocid()]
+
+    assert len(packager.backend.files) == 6
+    assert actual == [('ocds-213czf-{}'.format(i), [str(j) for j in range(i, 20, 7)]) for i in range(7)]
+
+
+def test_partitioned_backend():
+    data = [{'ocid': 'ocds-213czf-{}'.format(i % 7), 'id': str(i), 'date': ''} for i in range(20)]
+
+    with Packager(backend=PartitionedBackend(partitions=3)) as packager:
+        packager.add(data)
+
+        actual = [(ocid, [row[-1]['id'] for row in rows]) for ocid, rows in packager.backend.get_releases_by_ocid()]
+
+        assert packager.backend.grouped
+
+    assert actual == [('ocds-213czf-{}'.format(i), [str(j) for j in range(i, 20, 7)]) for i in range(7)]
+
+
+def test_compact_backend():
+    # Release 0 has a package URI, and OCIDs aren't added in order.
+    data = [{'ocid': 'ocds-213czf-{}'.format(-i % 7), 'id': str(i), 'date': ''} for i in range(20)]
+
+    with Packager(backend=CompactBackend()) as packager:
+        packager.backend.add_release(data[0], 'http://example.com')
+        packager.add(data[1:])
+
+        assert packager.backend.memory_usage > len(packager.backend.buffer) + 21 * 8 + 20 * 4 + 20 * 4
+
+        actual = [(ocid, [row[1:] for row in rows]) for ocid, rows in packager.backend.get_releases_by_ocid()]
+
+    assert actual == [('ocds-213czf-{}'.format(i), [('http://example.com' if j == 0 else '', data[j])
+                                                    for j in range(-i % 7, 20, 7)]) for i in range(7)]
+
+
+def test_compact_backend_memory_usage():
+    tracemalloc.start()
+    try:
+        backend = CompactBackend()
+        # Most OCIDs have a single release, so the OCIDs are a large part of the memory usage.
+        for i in range(10000):
+            backend.add_release({'ocid': 'ocds-213czf-{}'.format(i), 'id': '1', 'date': ''}, str(i // 100))
+
+        actual = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    assert abs(backend.memory_usage - actual) < actual * 0.05
+
+
+@pytest.mark.parametrize('compression', [None, 'zlib', 'lzma'])
+def test_sqlite_backend_compression(compression):
+    data = json.loads(read('realdata/release-package-1.json'))['releases']
+
+    backend = SQLiteBackend(compression=compression)
+    with Packager(backend=backend) as packager:
+        packager.add(data)
+
+        actual = [row[-1] for _, rows in packager.backend.get_releases_by_ocid() for row in rows]
+
+    assert actual == data
+    if compression:
+        assert 0 < backend.bytes_written < len(json_dumpb(data))
+    else:
+        assert backend.bytes_written == len(json_dumpb(data)) - len(data) - 1
+
+
+def test_sqlite_backend_path(tmpdir):
+    path = str(tmpdir.join('state.db'))
+    data = json.loads(read('realdata/release-package-1-2.json'))['releases']
+
+    with Packager(backend=SQLiteBackend(compression='zlib', path=path)) as packager:
+        packager.add(data[:2])
+
+        assert [ocid for ocid, _ in packager.backend.get_releases_by_ocid()] == ['OCDS-87SD3T-AD-SF-DRM-063-2015']
+
+    # The compression format of the existing database is used.
+    with Packager(backend=SQLiteBackend(path=path)) as packager:
+        packager.add(data[2:3])
+
+        actual = [(ocid, len(list(rows))) for ocid, rows in packager.backend.get_releases_by_ocid()]
+
+        assert packager.backend.compression == 'zlib'
+        assert actual == [('OCDS-87SD3T-AD-SF-DRM-065-2015', 1)]
+
+    # Releases are rolled back if the OCIDs aren't all yielded.
+    with Packager(backend=SQLiteBackend(path=path, only_touched=False)) as packager:
+        packager.add(data[3:])
+
+    with Packager(backend=SQLiteBackend(path=path, only_touched=False)) as packager:
+        actual = [(ocid, len(list(rows))) for ocid, rows in packager.backend.get_releases_by_ocid()]
+
+        assert actual == [('OCDS-87SD3T-AD-SF-DRM-063-2015', 2), ('OCDS-87SD3T-AD-SF-DRM-065-2015', 1)]
+
+
+def test_sqlite_backend_path_version(tmpdir):
+    path = str(tmpdir.join('state.db'))
+
+    with Packager(backend=SQLiteBackend(path=path)) as packager:
+        packager.add([json.loads(read('release-package_minimal.json'))])
+        list(packager.backend.get_releases_by_ocid())
+
+    with Packager(backend=SQLiteBackend(path=path)) as packager:
+        assert packager.version == '1.1'
+
+        with pytest.raises(InconsistentVersionError) as excinfo:
+            packager.add([json.loads(read('release_1.0.json'))])
+
+    assert excinfo.value.earlier_version == '1.1'
+    assert excinfo.value.current_version == '1.0'
+
+
+@pytest.mark.skipif(not os.getenv('OCDSKIT_TEST_DATABASE_URL'), reason='OCDSKIT_TEST_DATABASE_URL is not set')
+def test_postgresql_backend():
+    data = json.loads(read('realdata/release-package-1-2.json'))['releases']
+    data[0]['description'] = 'back\\slash\ttab\nnewline'
+
+    with Packager(backend=os.getenv('OCDSKIT_TEST_DATABASE_URL')) as packager:
+        packager.add(data)
+
+        actual = [(ocid, [row[-1] for row in rows]) for ocid, rows in packager.backend.get_releases_by_ocid()]
+
+    assert actual == [('OCDS-87SD3T-AD-SF-DRM-063-2015', data[:2]), ('OCDS-87SD3T-AD-SF-DRM-065-2015', data[2:])]
+
+
+@pytest.mark.skipif(not os.getenv('OCDSKIT_TEST_DATABASE_URL'), reason='OCDSKIT_TEST_DATABASE_URL is not set')
+def test_postgresql_backend_collation():
+    # In a locale like en_US.UTF-8, punctuation is ignored and case is folded, which would sort these differently.
+    ocids = ['ocds-213czf-a', 'OCDS-213CZF-B', 'ocds-213czf-12', 'ocds-213czf-1-3', 'ocds-213czf-1-2']
+    data = [{'ocid': ocid, 'id': '1', 'date': None} for ocid in ocids]
+
+    with Packager(backend=os.getenv('OCDSKIT_TEST_DATABASE_URL')) as packager:
+        packager.add(data)
+
+        actual = [ocid for ocid, rows in packager.backend.get_releases_by_ocid()]
+
+    assert actual == ['OCDS-213CZF-B', 'ocds-213czf-1-2', 'ocds-213czf-1-3', 'ocds-213czf-12', 'ocds-213czf-a']
+
+
+@pytest.mark.skipif(not ocdskit.packager.USING_DUCKDB, reason='duckdb is unavailable')
+def test_duckdb_backend():
+    data = json.loads(read('realdata/release-package-1-2.json'))['releases']
+    data[0]['description'] = 'back\\slash\ttab\nnewline'
+
+    with Packager(backend=DuckDBBackend(buffer_size=3)) as packager:
+        packager.add(data)
+
+        actual = [(ocid, [row[-1] for row in rows]) for ocid, rows in packager.backend.get_releases_by_ocid()]
+
+        assert packager.backend.flush_count == 2
+
+    assert not os.path.exists(packager.backend.directory)
+    assert actual == [('OCDS-87SD3T-AD-SF-DRM-063-2015', data[:2]), ('OCDS-87SD3T-AD-SF-DRM-065-2015', data[2:])]
+
+
+@pytest.mark.parametrize('memory_budget,backend_class,reason', [
+    (10 ** 9, CompactBackend, 'the memory budget (1000000000 bytes) is not yet exceeded'),
+    (10 ** 4, SQLiteBackend, 'the memory usage ('),
+])
+def test_memory_budget(memory_budget, backend_class, reason, monkeypatch):
+    monkeypatch.setattr(ocdskit.packager, 'USING_SQLITE', True)
+
+    data = json.loads(read('realdata/release-package-1-2.json'))['releases']
+
+    with Packager(memory_budget=memory_budget) as packager:
+        packager.add(data[:2])
+        packager.add(data[2:])
+
+        actual = [(ocid, [row[-1] for row in rows]) for ocid, rows in packager.backend.get_releases_by_ocid()]
+
+        assert isinstance(packager.backend, backend_class)
+        assert packager.backend_reason.startswith(reason)
+
+    assert actual == [('OCDS-87SD3T-AD-SF-DRM-063-2015', data[:2]), ('OCDS-87SD3T-AD-SF-DRM-065-2015', data[2:])]
+
+
+def test_upgrade_to():
+    data = [json.loads(read('realdata/release-package_1.1-1.json')),
+            json.loads(read('realdata/release-package_1.0-1.json'))]
+
+    with Packager(backend='python', upgrade_to='1.1') as packager:
+        packager.add(data)
+
+        releases = [release for _, rows in packager.backend.get_releases_by_ocid() for _, _, release in rows]
+
+    assert packager.version == '1.1'
+    assert all('parties' in release for release in releases)
+
+
+@pytest.mark.parametrize('deduplicate,duplicates', [('content', 2), ('id', 3)])
+def test_deduplicate(deduplicate, duplicates):
+    data = json.loads(read('realdata/release-package-1-2.json'))['releases']
+    changed = dict(data[0], description='changed')
+    reordered = dict(reversed(list(data[1].items())))
+
+    with Packager(backend='python', deduplicate=deduplicate) as packager:
+        packager.add(data + [data[0], reordered, changed])
+
+        actual = [release for _, rows in packager.backend.get_releases_by_ocid() for _, _, release in rows]
+
+    assert packager.duplicates == duplicates
+    assert len(actual) == len(data) + 3 - duplicates
+
+
+def test_ocids():
+    data = json.loads(read('realdata/release-package-1-2.json'))['releases']
+
+    with Packager(backend='python', ocids=['OCDS-87SD3T-AD-SF-DRM-065-2015']) as packager:
+        packager.add(data)
+
+        actual = [(ocid, [row[-1] for row in rows]) for ocid, rows in packager.backend.get_releases_by_ocid()]
+
+    assert actual == [('OCDS-87SD3T-AD-SF-DRM-065-2015', data[2:])]
+
+
+@pytest.mark.parametrize('kwargs,flush_count', [({}, 1), ({'buffer_size': 3}, 2), ({'buffer_bytes': 1}, 4)])
+def test_buffered_backend(kwargs, flush_count):
+    data = json.loads(read('realdata/release-package-1-2.json'))['releases']
+    backend = SQLiteBackend(**kwargs)
+
+    with Packager(backend=backend) as packager:
+        packager.add(data)
+
+        assert backend.rows_buffered == 4
+        assert backend.flush_count == flush_count
+        assert backend.buffer == []
+
+        actual = [(ocid, [row[-1] for row in rows]) for ocid, rows in backend.get_releases_by_ocid()]
+
+    assert actual == [('OCDS-87SD3T-AD-SF-DRM-063-2015', data[:2]), ('OCDS-87SD3T-AD-SF-DRM-065-2015', data[2:])]
+
+
+def test_add_presorted():
+    data = json.loads(read('realdata/release-package-1-2.json'))['releases']
+    read_ = []
+
+    def items():
+        for release in data:
+            read_.append(release)
+            yield release
+
+    with Packager(backend='python') as packager:
+        packager.add_presorted(items())
+
+        # The releases of the first OCID are read, and the first release of the next OCID.
+        assert len(read_) == 3
+
+        actual = [(ocid, [row[-1] for row in rows]) for ocid, rows in packager._get_releases_by_ocid()]
+
+    assert packager.backend.groups == {}
+    assert actual == [('OCDS-87SD3T-AD-SF-DRM-063-2015', data[:2]), ('OCDS-87SD3T-AD-SF-DRM-065-2015', data[2:])]
+
+
+@pytest.mark.parametrize('backend', ['python', 'sqlite', 'external-sort'])
+@pytest.mark.parametrize('kwargs,expected', [
+    ({'as_of': '2016-01-01'}, [[0], [2]]),
+    ({'changed_since': '2015-12-20'}, [[0, 1], [2, 3, 4]]),
+    ({'changed_since': '2017-06-05T00:00:00-06:00'}, []),
+    ({'as_of': '2016-01-01', 'changed_since': '2015-12-20'}, [[0]]),
+    ({'as_of': '2015-01-01'}, []),
+])
+def test_as_of_changed_since(backend, kwargs, expected):
+    data = json.loads(read('realdata/release-package-1-2.json'))['releases']
+    data.append({'ocid': 'OCDS-87SD3T-AD-SF-DRM-065-2015', 'id': 'undated', 'date': None})
+
+    with Packager(backend=backend, **kwargs) as packager:
+        packager.add(data)
+
+        actual = [[row[-1] for row in rows] for _, rows in packager._get_releases_by_ocid()]
+
+    assert actual == [[data[i] for i in indices] for indices in expected]
@@ -0,0 +1,109 @@
+import json
+import sqlite3
+
+import pytest
+from ocdsmerge import Merger
+
+from ocdskit.exceptions import InvalidDatabaseError, MissingTableError
+from ocdskit.store import ReleaseStore
+from tests import path, read
+
+
+def compiled_release(i, **kwargs):
+    return {'ocid': 'ocds-213czf-{}'.format(i), 'id': str(i), 'date': '2001-02-{:02d}T00:00:00Z'.format(i),
+            'tag': ['compiled'], 'buyer': {'id': str(i % 2)}, **kwargs}
+
+
+@pytest.mark.parametrize('kwargs,expected', [
+    ({}, [1, 2, 3, 4]),
+    ({'date_from': '2001-02-02'}, [2, 3, 4]),
+    ({'date_to': '2001-02-03T00:00:00Z'}, [1, 2, 3]),
+    ({'buyer_id': '1'}, [1, 3]),
+    ({'tag': 'compiled'}, [1, 2, 3, 4]),
+    ({'tag': 'tender'}, []),
+    ({'date_from': '2001-02-02', 'buyer_id': '1'}, [3]),
+])
+def test_find(kwargs, expected, tmpdir):
+    with ReleaseStore(str(tmpdir.join('releases.db'))) as store:
+        assert store.add(compiled_release(i) for i in (3, 1, 4, 2)) == 4
+
+        actual = list(store.find(**kwargs))
+
+    assert actual == [compiled_release(i) for i in expected]
+
+
+def test_get(tmpdir):
+    database = str(tmpdir.join('releases.db'))
+
+    with ReleaseStore(database) as store:
+        store.add([compiled_release(1), compiled_release(2)])
+    # Releases with the same OCID are replaced.
+    with ReleaseStore(database) as store:
+        store.add([compiled_release(1, title='changed')])
+
+    with ReleaseStore(database) as store:
+        assert store.get('ocds-213czf-1') == compiled_release(1, title='changed')
+        assert store.get('ocds-213czf-2') == compiled_release(2)
+        assert store.get('ocds-213czf-3') is None
+
+
+def test_versioned(tmpdir):
+    merger = Merger(path('release-schema.json'))
+    releases = json.loads(read('realdata/release-package-1-2.json'))['releases']
+    data = [merger.create_versioned_release(releases[:2]), merger.create_versioned_release(releases[2:])]
+
+    with ReleaseStore(str(tmpdir.join('releases.db')), versioned=True) as store:
+        store.add(data)
+
+        # A versioned release has no `date`: the latest `releaseDate` is indexed.
+        assert list(store.find(date_from='2017-06-05')) == data
+        assert list(store.find(date_to='2017')) == []
+        assert list(store.find(tag='tender')) == data
+        assert list(store.find(tag='compiled')) == []
+
+
+def test_versioned_buyer_id(tmpdir):
+    merger = Merger(path('release-schema.json'))
+    releases = [{'ocid': 'ocds-213czf-1', 'id': str(i), 'date': '2001-02-0{}T00:00:00Z'.format(i), 'tag': [tag],
+                 'buyer': {'id': buyer_id}} for i, tag, buyer_id in ((1, 'tender', '1'), (2, 'award', '2'))]
+    data = [merger.create_versioned_release(releases)]
+
+    with ReleaseStore(str(tmpdir.join('releases.db')), versioned=True) as store:
+        store.add(data)
+
+        assert list(store.find(buyer_id='2')) == data
+        assert list(store.find(buyer_id='1')) == []
+        assert list(store.find(tag='award')) == data
+        assert list(store.find(date_from='2001-02-02T00:00:00Z')) == data
+        assert list(store.find(date_from='2001-02-03')) == []
+
+
+def test_readonly(tmpdir):
+    database = str(tmpdir.join('releases.db'))
+
+    with ReleaseStore(database) as store:
+        store.add([compiled_release(1)])
+
+    with ReleaseStore(database, readonly=True) as store:
+        assert store.get('ocds-213czf-1') == compiled_release(1)
+
+    with pytest.raises(MissingTableError) as excinfo:
+        ReleaseStore(database, versioned=True, readonly=True)
+
+    assert str(excinfo.value) == '{} has no versioned_releases table'.format(database)
+
+    # No tables are created.
+    connection = sqlite3.connect(database)
+    assert [row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")] == [
+        'compiled_releases', 'compiled_releases_tags']
+    connection.close()
+
+
+def test_readonly_invalid(tmpdir):
+    database = tmpdir.join('releases.json')
+    database.write(read('release-package_minimal.json'))
+
+    with pytest.raises(InvalidDatabaseError) as excinfo:
+        ReleaseStore(str(database), readonly=True)
+
+    assert str(excinfo.value) == '{} is not a SQLite database'.format(database)
@@ -1,9 +1,12 @@
 import json
+from decimal import Decimal
+from io import BytesIO
 
 import pytest
 
 from ocdskit.util import (detect_format, get_ocds_minor_version, is_compiled_release, is_linked_release, is_package,
-                          is_record, is_record_package, is_release, is_release_package, json_dump)
+                          is_record, is_record_package, is_release, is_release_package, json_dump, read_files,
+                          read_json_lines)
 from tests import path, read
 
 
@@ -142,3 +145,54 @@ def test_detect_format(filename, expected):
     result = detect_format(path(filename))
 
     assert result == expected
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_read_files(workers):
+    # ijson parses numbers as Decimal.
+    expected = [json.loads(read('realdata/release-package-{}.json'.format(i)), parse_float=Decimal) for i in (1, 2)]
+    expected.extend(json.loads(read('release-packages.json'), parse_float=Decimal))
+
+    actual = list(read_files([path('realdata/release-package-[12].json'), path('release-packages.json')],
+                             workers=workers))
+
+    assert actual == expected
+
+
+def test_read_files_json_lines():
+    expected = [json.loads(read('release-package_minimal.json'))] * 2
+
+    actual = list(read_files([path('release-package_minimal.json')] * 2, json_lines=True))
+
+    assert actual == expected
+
+
+@pytest.mark.parametrize('prefix,expected', [
+    ('', [{'releases': [{'ocid': 'x'}, {'ocid': 'y'}]}, [{'releases': []}], {'ocid': 'z'}]),
+    ('releases', [[{'ocid': 'x'}, {'ocid': 'y'}]]),
+    ('releases.item', [{'ocid': 'x'}, {'ocid': 'y'}]),
+    ('item.releases', [[]]),
+    ('missing', []),
+])
+def test_read_json_lines(prefix, expected):
+    f = BytesIO(b'{"releases":[{"ocid":"x"},{"ocid":"y"}]}\n\n[{"releases":[]}]\n{"ocid":"z"}')
+
+    actual = list(read_json_lines(f, prefix))
+
+    assert actual == expected
+
+
+def test_read_files_missing():
+    with pytest.raises(FileNotFoundError):
+        list(read_files([path('nonexistent.json')]))
+
+
+def test_read_files_directory(tmpdir):
+    tmpdir.mkdir('directory.json')
+    tmpdir.join('release-package.json').write(read('release-package_minimal.json'))
+
+    # Directories that match a pattern are skipped.
+    assert list(read_files([str(tmpdir.join('*.json'))])) == [json.loads(read('release-package_minimal.json'))]
+
+    with pytest.raises(IsADirectoryError):
+        list(read_files([str(tmpdir.join('directory.json'))]))